@@ -0,0 +1,123 @@
+"""
+实时分析模块
+在后台线程中持续运行 engine.analysis()，按固定频率发布前 N 条变化；
+局面改变时立即停止当前搜索并在同一个引擎进程上开始新局面
+"""
+
+import threading
+import time
+import chess
+import chess.engine
+
+
+def format_score(score):
+    """以白方视角格式化评分：+0.35 / -1.20 / #3 / #-2"""
+    white = score.white()
+    if white.is_mate():
+        return f"#{white.mate()}"
+    return f"{white.score() / 100:+.2f}"
+
+
+class AnalysisSession:
+    def __init__(self, engine, multipv=3, update_hz=4, max_pv_moves=6, eval_cache=None, on_update=None):
+        self.engine = engine
+        self.on_update = on_update  # 每次发布结果后在分析线程中调用
+        self.eval_cache = eval_cache  # 开始搜索前先显示缓存结果，搜索结束后写回
+        self.multipv = multipv
+        self.update_interval = 1.0 / update_hz
+        self.max_pv_moves = max_pv_moves
+        self.board = None  # 待分析的局面
+        self.fen = None
+        self.current = None  # 正在进行的 SimpleAnalysisResult
+        self.snapshot = None  # 最近一次发布的结果，供界面读取
+        self.version = 0  # 每次发布后递增
+        self.running = True
+        self.lock = threading.Lock()
+        self.changed = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def set_position(self, board):
+        """切换分析局面；局面未变时什么都不做"""
+        fen = board.fen()
+        if fen == self.fen:
+            return
+        with self.lock:
+            self.fen = fen
+            self.board = board.copy()
+            self.snapshot = None
+            if self.current is not None:
+                self.current.stop()
+        self.changed.set()
+
+    def stop(self):
+        self.running = False
+        with self.lock:
+            if self.current is not None:
+                self.current.stop()
+        self.changed.set()
+        self.thread.join(1.0)
+
+    def _run(self):
+        while self.running:
+            self.changed.wait()
+            self.changed.clear()
+            with self.lock:
+                board = self.board
+            if not self.running or board is None or board.is_game_over():
+                continue
+            try:
+                self._analyse(board)
+            except (chess.engine.EngineError, chess.engine.EngineTerminatedError) as e:
+                print(f"分析失败: {e}")
+                time.sleep(1)
+            except Exception as e:
+                print(f"分析失败: {e}")
+                time.sleep(1)
+
+    def _analyse(self, board):
+        if self.eval_cache is not None and (entry := self.eval_cache.get(board)):
+            self._publish(board, {1: {"depth": entry.depth, "score": entry.score, "pv": entry.pv}}, cached=True)
+        analysis = self.engine.analysis(board, multipv=self.multipv)
+        with self.lock:
+            if board is not self.board or not self.running:
+                analysis.stop()  # 启动期间局面已变化
+            self.current = analysis
+        lines = {}
+        last_publish = 0.0
+        try:
+            for info in analysis:
+                if "pv" not in info or "score" not in info:
+                    continue
+                lines[info.get("multipv", 1)] = info
+                now = time.monotonic()
+                if now - last_publish >= self.update_interval:
+                    self._publish(board, lines)
+                    last_publish = now
+            if lines:
+                self._publish(board, lines)
+                if self.eval_cache is not None:
+                    self.eval_cache.put(board, lines[min(lines)])
+        finally:
+            with self.lock:
+                if self.current is analysis:
+                    self.current = None
+
+    def _publish(self, board, lines, cached=False):
+        best = lines[min(lines)]
+        snapshot = {
+            "fen": board.fen(),
+            "cached": cached,
+            "depth": best.get("depth", 0),
+            "nps": best.get("nps", 0),
+            "lines": [(format_score(info["score"]), board.variation_san(info["pv"][:self.max_pv_moves]))
+                      for _, info in sorted(lines.items())],
+            "infos": [info for _, info in sorted(lines.items())],
+        }
+        with self.lock:
+            if board is not self.board:
+                return  # 局面已切换，丢弃旧结果
+            self.snapshot = snapshot
+            self.version += 1
+        if self.on_update:
+            self.on_update()
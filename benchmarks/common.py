@@ -0,0 +1,151 @@
+"""
+基准测试公共工具
+局面语料、逐次调用计时、内存统计，以及 JSON 结果的保存和对比
+"""
+
+import os
+import sys
+import gc
+import json
+import time
+import platform
+import subprocess
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CORPUS_PGN = os.path.join(ROOT, "benchmarks", "corpus.pgn")
+
+
+def setup():
+    """以仓库根目录为工作目录（图片、开局书等都是相对路径）"""
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+    os.chdir(ROOT)
+
+
+def corpus_positions():
+    """基准局面：openings.json 中每条开局线路和 corpus.pgn 中每盘棋的所有局面"""
+    import chess
+    import chess.pgn
+    from constants import OPENINGS_DATA
+
+    boards = []
+    for seq in OPENINGS_DATA.values():
+        board = chess.Board()
+        for uci in seq:
+            try:
+                board.push_uci(uci)
+            except ValueError:
+                break
+            boards.append(board.copy())
+    with open(CORPUS_PGN, encoding="utf-8") as f:
+        while (game := chess.pgn.read_game(f)) is not None:
+            board = game.board()
+            for move in game.mainline_moves():
+                board.push(move)
+                boards.append(board.copy())
+    return boards
+
+
+def _percentile(ordered, p):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+def measure(func, iterations, warmup=10):
+    """逐次调用 func(i)，返回延迟分布（微秒）和每秒调用次数"""
+    for i in range(warmup):
+        func(i)
+    samples = []
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for i in range(iterations):
+            start = time.perf_counter()
+            func(i)
+            samples.append((time.perf_counter() - start) * 1e6)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    ordered = sorted(samples)
+    total = sum(samples)
+    return {
+        "iterations": iterations,
+        "mean_us": total / iterations,
+        "min_us": ordered[0],
+        "p50_us": _percentile(ordered, 50),
+        "p90_us": _percentile(ordered, 90),
+        "p99_us": _percentile(ordered, 99),
+        "max_us": ordered[-1],
+        "ops_per_sec": iterations / (total / 1e6) if total else 0.0,
+    }
+
+
+def measure_memory(func, iterations):
+    """用 tracemalloc 统计 Python 层内存：每次调用的临时分配峰值，以及全部调用结束后仍保留的内存块数和字节数
+    （SDL 像素缓冲区不经过 Python 分配器，不在统计范围内）"""
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        base, _ = tracemalloc.get_traced_memory()
+        peaks = []
+        for i in range(iterations):
+            current, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            func(i)
+            peaks.append(tracemalloc.get_traced_memory()[1] - current)
+        after = tracemalloc.take_snapshot()
+        retained = tracemalloc.get_traced_memory()[0] - base
+    finally:
+        tracemalloc.stop()
+    stats = after.compare_to(before, "filename")
+    return {
+        "peak_bytes_per_call": sum(peaks) / iterations,
+        "retained_blocks": sum(s.count_diff for s in stats),
+        "retained_bytes": retained,
+    }
+
+
+def metadata():
+    """结果文件中的环境信息，便于在不同提交之间对比"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                                text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "commit": commit,
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+    }
+
+
+def add_arguments(parser, iterations):
+    parser.add_argument("--iterations", type=int, default=iterations, help="每项测试的调用次数")
+    parser.add_argument("--warmup", type=int, default=10, help="正式计时前的预热次数")
+    parser.add_argument("--only", nargs="*", help="只运行名称包含这些关键字的测试")
+    parser.add_argument("--output", help="结果 JSON 文件路径")
+    parser.add_argument("--compare", help="与之前保存的结果 JSON 对比")
+
+
+def selected(name, only):
+    return not only or any(key in name for key in only)
+
+
+def report(results, meta, output=None, compare=None, key="p50_us"):
+    """打印结果表（可选与旧结果对比），并写入 JSON"""
+    baseline = {}
+    if compare:
+        with open(compare, encoding="utf-8") as f:
+            baseline = json.load(f).get("results", {})
+    print(f"{'测试':<32}{key:>12}{'p99_us':>12}{'ops/s':>12}  对比")
+    for name, result in results.items():
+        line = f"{name:<32}{result[key]:>12.1f}{result['p99_us']:>12.1f}{result['ops_per_sec']:>12.0f}"
+        if name in baseline and baseline[name].get(key):
+            line += f"  {result[key] / baseline[name][key]:.2f}x"
+        print(line)
+    if output:
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump({"meta": meta, "results": results}, f, ensure_ascii=False, indent=2)
+        print(f"结果已保存: {output}")
@@ -0,0 +1,108 @@
+"""
+GameLogic 热点路径基准测试
+坐标转换、开局书查询（冷 / 热缓存）、走子合法性检查和联机同步（全量重放 / 增量同步），在真实对局局面上测量 ops/s 和内存
+
+示例:
+    python benchmarks/logic_bench.py --book ./engine/human.bin --output bench-results/logic.json
+    python benchmarks/logic_bench.py --compare bench-results/logic.json
+"""
+
+import os
+import argparse
+
+import common
+
+
+def build_cases(book_path=None):
+    """返回 {测试名: func(i)}"""
+    import chess
+    from engine_manager import EngineManager
+    from logic import GameLogic
+    from book import PolyglotBook
+
+    logic = GameLogic(EngineManager(idle_timeout=0))
+    if book_path:
+        logic.book = PolyglotBook(book_path)
+    if not os.path.exists(logic.book.path):
+        print(f"开局书不存在: {logic.book.path}，开局书测试只测量空查询")
+    positions = common.corpus_positions()
+
+    # 走子检查用 (局面, 实际走法, 非法走法) 三元组：实际走法取语料中的下一步
+    checks = []
+    for board, next_board in zip(positions, positions[1:]):
+        if next_board.move_stack[:-1] == board.move_stack:
+            played = next_board.move_stack[-1]
+            checks.append((board, played, chess.Move(played.to_square, played.from_square)))
+
+    # 联机重放：每盘棋每一步的完整 UCI 走法串（与 ChessApp.update 收到的 gameState 相同）
+    move_strings = [" ".join(m.uci() for m in board.move_stack) for board in positions]
+    sync_logic = GameLogic(EngineManager(idle_timeout=0))
+
+    def coords(color):
+        # 每次调用把 64 个格子各往返转换一次
+        def run(i):
+            logic.player_color = color
+            for sq in chess.SQUARES:
+                logic.get_sq_from_coords(*logic.get_coords_from_sq(sq))
+        return run
+
+    def book_cold(i):
+        logic.clear_book_cache()
+        logic.board = positions[i % len(positions)]
+        logic.get_external_book_moves()
+
+    def book_warm(i):
+        logic.board = positions[i % len(positions)]
+        logic.get_external_book_moves()
+
+    def legal_check(i):
+        # 与 ChessApp.handle_move 相同的检查：选中棋子、升变判定、走法合法性
+        board, played, illegal = checks[i % len(checks)]
+        for move in (played, illegal):
+            piece = board.piece_at(move.from_square)
+            if piece and piece.piece_type == chess.PAWN and chess.square_rank(move.to_square) in (0, 7):
+                any(m.from_square == move.from_square and m.to_square == move.to_square and m.promotion is not None
+                    for m in board.legal_moves)
+            chess.Move(move.from_square, move.to_square) in board.legal_moves
+
+    def online_replay(i):
+        # ChessApp.update 联机分支：每个事件都从初始局面重放全部走法
+        board = chess.Board()
+        for m in move_strings[i % len(move_strings)].split():
+            board.push_uci(m)
+
+    def online_sync(i):
+        # 同一场景用 GameLogic.sync_moves：依次同步语料局面，对局内每次只新增一步，换局时回退
+        sync_logic.sync_moves(move_strings[i % len(move_strings)].split())
+
+    return {
+        "coords_white": coords(chess.WHITE),
+        "coords_black": coords(chess.BLACK),
+        "book_moves_cold": book_cold,
+        "book_moves_warm": book_warm,
+        "legal_move_check": legal_check,
+        "online_replay": online_replay,
+        "online_sync": online_sync,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="GameLogic 基准测试")
+    common.add_arguments(parser, iterations=2000)
+    parser.add_argument("--book", help="使用指定的 polyglot 开局书（默认 BOOK_PATH）")
+    args = parser.parse_args(argv)
+
+    common.setup()
+    cases = build_cases(args.book)
+    results = {}
+    for name, func in cases.items():
+        if not common.selected(name, args.only):
+            continue
+        result = common.measure(func, args.iterations, args.warmup)
+        result.update(common.measure_memory(func, min(args.iterations, 500)))
+        results[name] = result
+    common.report(results, common.metadata(), args.output, args.compare)
+
+
+if __name__ == "__main__":
+    main()
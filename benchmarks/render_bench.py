@@ -0,0 +1,111 @@
+"""
+渲染基准测试
+在 SDL dummy 驱动下对离屏 Surface 运行 Renderer，逐次测量各绘制函数的延迟分布和内存分配，
+结果可以保存为 JSON，在不同提交之间对比
+
+示例:
+    python benchmarks/render_bench.py --output bench-results/render.json
+    python benchmarks/render_bench.py --compare bench-results/render.json
+"""
+
+import os
+import argparse
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import common
+
+
+def build_cases():
+    """返回 {测试名: func(i)}；需要局面的测试按 i 轮流使用语料中的局面"""
+    import pygame
+    import chess
+    from constants import WIDTH, HEIGHT, OPENINGS_DATA
+    from engine_manager import EngineManager
+    from logic import GameLogic
+    from renderer import Renderer
+    import main
+
+    pygame.init()
+    pygame.display.set_mode((WIDTH, HEIGHT))
+    surface = pygame.Surface((WIDTH, HEIGHT)).convert()  # 离屏绘制目标
+    ui = Renderer(surface)
+    logic = GameLogic(EngineManager(idle_timeout=0))
+    positions = common.corpus_positions()
+    learning_seq = next(iter(OPENINGS_DATA.values()), ["e2e4"])
+
+    def position(i):
+        logic.board = positions[i % len(positions)]
+
+    def board_cycle(i):
+        position(i)
+        ui.draw_board(logic, None, 'PLAYING', 0, [], False)
+
+    def board_static(i):
+        ui.draw_board(logic, None, 'PLAYING', 0, [], False)
+
+    def board_hints(i):
+        # 开局书箭头 + 百科高亮 + 选中格 + 残局库箭头
+        position(i)
+        move = next(iter(logic.board.legal_moves), None)
+        hint = (move, 2, 5) if move else None
+        ui.draw_board(logic, move.from_square if move else None, 'LEARNING', 0, learning_seq, True, hint)
+
+    def board_black(i):
+        logic.player_color = chess.BLACK
+        try:
+            board_cycle(i)
+        finally:
+            logic.player_color = chess.WHITE
+
+    def panel(i):
+        position(i)
+        ui.draw_panel(logic, 'PLAYING', "", 0, [])
+
+    def clock_panel(i):
+        ui.draw_clock_panel(600 - i * 0.37, 600 - i * 0.21, chess.WHITE if i % 2 else chess.BLACK, chess.WHITE)
+
+    def promotion_menu(i):
+        ui.draw_promotion_menu(chess.WHITE if i % 2 else chess.BLACK)
+
+    # 开局菜单滚动列表在 ChessApp 中绘制
+    app = main.ChessApp()
+    app.state = 'OPENING_MENU'
+    max_scroll = max(0, len(OPENINGS_DATA) * 50 - 400)
+
+    def opening_menu(i):
+        app.scroll_offset = (i * 13) % (max_scroll + 1)
+        app._draw_scene()
+
+    return {
+        "draw_board": board_cycle,
+        "draw_board_static": board_static,
+        "draw_board_hints": board_hints,
+        "draw_board_black": board_black,
+        "draw_panel": panel,
+        "draw_clock_panel": clock_panel,
+        "draw_promotion_menu": promotion_menu,
+        "opening_menu_scroll": opening_menu,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="渲染基准测试")
+    common.add_arguments(parser, iterations=300)
+    args = parser.parse_args(argv)
+
+    common.setup()
+    cases = build_cases()
+    results = {}
+    for name, func in cases.items():
+        if not common.selected(name, args.only):
+            continue
+        result = common.measure(func, args.iterations, args.warmup)
+        result.update(common.measure_memory(func, min(args.iterations, 100)))
+        results[name] = result
+    common.report(results, common.metadata(), args.output, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Polyglot 开局书模块
+开局书只映射一次，按 Zobrist 哈希查询；文件被替换后自动重新加载
+"""
+
+import os
+import time
+import bisect
+import threading
+from collections import namedtuple
+import chess
+import chess.polyglot
+
+# 稀疏索引的步长：每隔多少条记录取一个 key
+INDEX_STRIDE = 256
+
+# 解码后的开局书走法
+BookMove = namedtuple("BookMove", ["move", "weight", "learn"])
+
+
+class IndexedReader(chess.polyglot.MemoryMappedReader):
+    """带稀疏 key 索引的 MemoryMappedReader：find_all 的二分查找先在索引中定位块"""
+
+    def __init__(self, filename):
+        super().__init__(filename)
+        # polyglot 文件本身按 key 排序，只需每隔 INDEX_STRIDE 条取一个 key
+        entry_size = chess.polyglot.ENTRY_STRUCT.size
+        key_struct = chess.polyglot.ENTRY_STRUCT
+        self.index = [key_struct.unpack_from(self.mmap, i * entry_size)[0]
+                      for i in range(0, len(self), INDEX_STRIDE)]
+
+    def bisect_key_left(self, key):
+        """先在稀疏索引中定位块，再在块内二分查找第一条 key 记录"""
+        block = bisect.bisect_left(self.index, key)
+        lo = max(0, block - 1) * INDEX_STRIDE
+        hi = min(len(self), block * INDEX_STRIDE + 1)
+        entry_size = chess.polyglot.ENTRY_STRUCT.size
+        key_struct = chess.polyglot.ENTRY_STRUCT
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if key_struct.unpack_from(self.mmap, mid * entry_size)[0] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+
+class PolyglotBook:
+    def __init__(self, path, check_interval=1.0):
+        self.path = path
+        self.check_interval = check_interval  # 检查文件变化的最小间隔（秒）
+        self.reader = None
+        self.mtime = None
+        self.size = 0
+        self.last_check = 0.0
+        self.generation = 0  # 每次重新加载后递增，供上层缓存判断失效
+        self.lock = threading.Lock()
+
+    def _load(self):
+        """映射开局书文件（IndexedReader 建立稀疏 key 索引）"""
+        self.close()
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return
+        try:
+            self.reader = IndexedReader(self.path)
+        except Exception as e:
+            print(f"读取外部开局书失败: {e}")
+            return
+        self.generation += 1
+        self.mtime = stat.st_mtime_ns
+        self.size = stat.st_size
+
+    def _ensure_loaded(self):
+        """按间隔检查文件的 mtime，变化时重新加载（文件不存在时同样按间隔检查）"""
+        now = time.monotonic()
+        if now - self.last_check < self.check_interval:
+            return
+        self.last_check = now
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            self.close()
+            return
+        if self.reader is None or stat.st_mtime_ns != self.mtime or stat.st_size != self.size:
+            self._load()
+
+    def find_all(self, board, key=None):
+        """返回局面的所有开局书记录 (chess.polyglot.Entry)，只包含合法走法。
+        已知 Zobrist 哈希时传入 key，不在开局书中的局面不再计算哈希"""
+        with self.lock:
+            self._ensure_loaded()
+            reader = self.reader
+            if reader is None:
+                return []
+            if key is not None:
+                i = reader.bisect_key_left(key)
+                if i >= len(reader) or reader[i].key != key:
+                    return []
+            return list(reader.find_all(board))
+
+    def close(self):
+        if self.reader is not None:
+            self.reader.close()
+        self.reader = None
+        self.mtime = None
+        self.size = 0
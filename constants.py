@@ -27,6 +27,82 @@ PANEL_COLOR = (38, 37, 34)
 STOCKFISH_PATH = "./engine/stockfish-windows-x86-64-avx2.exe"
 BOOK_PATH = "./engine/human.bin"
 OPENINGS_PATH = "./openings.json"
+SYZYGY_PATH = "./engine/syzygy"  # Syzygy 残局库目录，不存在时不使用残局库
+EVAL_CACHE_PATH = "./engine/evals.sqlite"  # 引擎评估的本地缓存
+
+# 引擎参数：None 表示按本机 CPU 核数 / 可用内存自动设置
+ENGINE_THREADS = None
+ENGINE_HASH_MB = None
+ENGINE_HASH_MAX_MB = 1024
+ENGINE_BENCH_PATH = "./engine/bench.json"
+ENGINE_REFERENCE_NPS = 1000000  # 难度等级的思考时间以该速度的机器为基准
+ENGINE_MOVE_OVERHEAD = 100  # 毫秒，计时对局中为界面和通讯预留的时间，避免 AI 超时
+
+# 难度等级 (名称, 搜索限制)，限制可任意组合 time（秒）/ depth / nodes
+DIFFICULTY_LEVELS = [
+    ("入门", {"depth": 2}),
+    ("业余", {"time": 0.05}),
+    ("进阶", {"time": 0.1}),
+    ("大师", {"time": 0.5}),
+    ("最强", {"time": 2.0}),
+]
+DEFAULT_DIFFICULTY = 2
+
+# 引擎进程空闲多少秒后关闭（0 表示直到退出程序才关闭）
+ENGINE_IDLE_TIMEOUT = 300
+
+# 人机对战：玩家思考时让引擎预测玩家应着并提前搜索（后台思考）
+ENGINE_PONDER = False
+
+# 实时分析面板：显示的变化数、每秒刷新次数
+ANALYSIS_MULTIPV = 3
+ANALYSIS_UPDATE_HZ = 4
+
+# 评估缓存：最多保存的局面数、超出后的淘汰方式（'oldest' 或 'shallowest'），
+# 以及完全由时钟决定强度的难度等级直接使用缓存走法所需的最小深度
+EVAL_CACHE_MAX_ENTRIES = 200000
+EVAL_CACHE_EVICTION = "oldest"
+EVAL_CACHE_MIN_DEPTH = 20
+
+# 对局复盘：每个局面的搜索深度、并行引擎进程数（None 表示 CPU 核数）、每个进程的 Hash（MB）
+REVIEW_DEPTH = 14
+REVIEW_WORKERS = None
+REVIEW_HASH_MB = 64
+# 评分损失（厘兵）达到多少算漏着 / 错着 / 失准
+REVIEW_THRESHOLDS = [("漏着", 300), ("错着", 100), ("失准", 50)]
+
+# 残局库：缓存的局面数；是否在残局库能给出结果时直接判定人机对局胜负
+TABLEBASE_CACHE_SIZE = 65536
+TABLEBASE_ADJUDICATE = False
+
+# 开局书查询缓存（按局面 Zobrist 哈希缓存的局面数）
+BOOK_CACHE_SIZE = 4096
+
+# 局部重绘：只重绘发生变化的区域（走子涉及的格子、时钟、悬停按钮），画面不变时跳过绘制
+DIRTY_RECT_RENDERING = True
+
+# 主循环：动画或拖拽时的帧率；空闲时最长睡眠多久（毫秒）后自检一次
+MAX_FPS = 60
+IDLE_MAX_WAIT_MS = 1000
+
+# 文字渲染缓存：最多缓存的 (字体, 文字, 颜色) 组合数
+TEXT_CACHE_SIZE = 512
+
+# 棋子图集：预先缩放的格子尺寸（窗口缩放 / 高分屏直接取对应尺寸），以及磁盘缓存路径
+PIECE_SPRITE_SIZES = (60, 75, 90, 120, 150)
+SPRITE_ATLAS_PATH = "./images/atlas.png"
+
+# 性能分析：F3 显示帧耗时叠加层，F4 对接下来 N 帧做 cProfile 采样并保存到 PROFILE_CAPTURE_DIR
+PROFILER_HISTORY = 300
+PROFILE_CAPTURE_FRAMES = 300
+PROFILE_CAPTURE_DIR = "."
+
+# Lichess 连接池：界面请求和发送走法的最大连接数；后台事件流 / 对局流连接失败以及走法重发的重试次数和退避系数（秒）
+LICHESS_POOL_SIZE = 8
+LICHESS_RETRIES = 3
+LICHESS_RETRY_BACKOFF = 0.3
+# 联机走法重发时被拒绝（之前的请求可能已生效）后，等待对局状态确认的秒数，超时仍未确认则撤回
+LICHESS_MOVE_CONFIRM_TIMEOUT = 5
 
 # 从外部 JSON 文件加载开局数据
 def _load_openings():
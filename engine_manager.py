@@ -0,0 +1,116 @@
+"""
+引擎进程管理
+每种配置只保留一个常驻（预热）的引擎进程，跨对局复用；
+只有在退出程序或空闲超时后才关闭进程
+"""
+
+import sys
+import threading
+import time
+import chess.engine
+from engine_worker import EngineWorker
+
+
+class EngineHandle:
+    """一个常驻引擎进程及其后台线程"""
+    def __init__(self, engine, worker, startup_time):
+        self.engine = engine
+        self.worker = worker
+        self.startup_time = startup_time  # 启动 + UCI 握手耗时（秒）
+        self.users = 0
+        self.last_used = time.monotonic()
+
+
+class EngineManager:
+    def __init__(self, idle_timeout=300):
+        self.idle_timeout = idle_timeout  # 空闲多少秒后关闭进程，0 或 None 表示不自动关闭
+        self.handles = {}  # 配置 -> EngineHandle
+        self.lock = threading.Lock()
+        self.reaper = None
+        self.reaper_stop = threading.Event()
+
+    @staticmethod
+    def _config_key(path, options, role):
+        command = tuple(path) if isinstance(path, (list, tuple)) else path
+        return command, tuple(sorted((options or {}).items())), role
+
+    def acquire(self, path, options=None, role="play"):
+        """获取指定配置的引擎（没有可用进程时才启动新进程），返回 EngineHandle
+
+        role 区分同时使用的进程（如对弈与实时分析），同一 role 共用一个进程
+        """
+        key = self._config_key(path, options, role)
+        with self.lock:
+            handle = self.handles.get(key)
+            if handle is not None and not self._alive(handle):
+                print("引擎进程已退出，重新启动", file=sys.stderr)
+                self._close(handle)
+                handle = None
+            if handle is None:
+                handle = self._launch(path, options)
+                self.handles[key] = handle
+                self._start_reaper()
+            handle.users += 1
+            handle.last_used = time.monotonic()
+            return handle
+
+    def release(self, handle):
+        """对局结束时归还引擎：取消进行中的搜索，但保留进程"""
+        with self.lock:
+            handle.worker.cancel_all()
+            handle.users = max(0, handle.users - 1)
+            handle.last_used = time.monotonic()
+
+    def shutdown(self):
+        """关闭所有引擎进程"""
+        self.reaper_stop.set()
+        with self.lock:
+            for handle in self.handles.values():
+                self._close(handle)
+            self.handles.clear()
+
+    def reap_idle(self):
+        """关闭空闲超时的引擎进程"""
+        if not self.idle_timeout:
+            return
+        now = time.monotonic()
+        with self.lock:
+            for key, handle in list(self.handles.items()):
+                if handle.users == 0 and now - handle.last_used >= self.idle_timeout:
+                    print(f"引擎空闲超过 {self.idle_timeout} 秒，关闭进程", file=sys.stderr)
+                    self._close(handle)
+                    del self.handles[key]
+
+    def _launch(self, path, options):
+        start = time.perf_counter()
+        engine = chess.engine.SimpleEngine.popen_uci(path)
+        if options:
+            # 只设置引擎支持的选项
+            engine.configure({name: value for name, value in options.items() if name in engine.options})
+        startup_time = time.perf_counter() - start
+        print(f"引擎启动耗时: {startup_time * 1000:.0f} ms", file=sys.stderr)
+        return EngineHandle(engine, EngineWorker(engine), startup_time)
+
+    @staticmethod
+    def _alive(handle):
+        return not handle.engine.protocol.returncode.done()
+
+    @staticmethod
+    def _close(handle):
+        handle.worker.stop()
+        try:
+            handle.engine.quit()
+        except Exception:
+            pass
+
+    def _start_reaper(self):
+        if not self.idle_timeout or (self.reaper and self.reaper.is_alive()):
+            return
+        self.reaper_stop.clear()
+
+        def reap_loop():
+            while not self.reaper_stop.wait(min(30, self.idle_timeout)):
+                self.reap_idle()
+
+        self.reaper = threading.Thread(target=reap_loop, daemon=True)
+        self.reaper.start()
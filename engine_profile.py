@@ -0,0 +1,141 @@
+"""
+引擎参数配置
+按本机 CPU 核数和可用内存设置 Threads/Hash，按难度等级生成搜索限制，
+并通过引擎自带的 bench 命令测量本机速度（nodes/second）
+"""
+
+import os
+import re
+import json
+import time
+import subprocess
+import chess.engine
+from constants import (ENGINE_THREADS, ENGINE_HASH_MB, ENGINE_HASH_MAX_MB, ENGINE_BENCH_PATH,
+                       ENGINE_REFERENCE_NPS, ENGINE_MOVE_OVERHEAD, DIFFICULTY_LEVELS)
+
+# 可选依赖：psutil 可以更准确地获取可用内存
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
+
+def available_memory_mb():
+    """可用物理内存（MB），无法获取时返回 None"""
+    if PSUTIL_AVAILABLE:
+        return psutil.virtual_memory().available // (1024 * 1024)
+    try:
+        # Linux / macOS
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE") // (1024 * 1024)
+    except (AttributeError, ValueError, OSError):
+        pass
+    try:
+        # Windows
+        import ctypes
+
+        class MEMORYSTATUSEX(ctypes.Structure):
+            _fields_ = [("dwLength", ctypes.c_ulong), ("dwMemoryLoad", ctypes.c_ulong),
+                        ("ullTotalPhys", ctypes.c_ulonglong), ("ullAvailPhys", ctypes.c_ulonglong),
+                        ("ullTotalPageFile", ctypes.c_ulonglong), ("ullAvailPageFile", ctypes.c_ulonglong),
+                        ("ullTotalVirtual", ctypes.c_ulonglong), ("ullAvailVirtual", ctypes.c_ulonglong),
+                        ("ullAvailExtendedVirtual", ctypes.c_ulonglong)]
+
+        status = MEMORYSTATUSEX()
+        status.dwLength = ctypes.sizeof(MEMORYSTATUSEX)
+        ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status))
+        return status.ullAvailPhys // (1024 * 1024)
+    except Exception:
+        return None
+
+
+_engine_options = None
+
+
+def engine_options():
+    """按硬件生成引擎的 Threads/Hash 选项（constants 中显式设置时以设置为准）
+
+    只在进程内计算一次：选项是 EngineManager 识别引擎进程的 key，而可用内存会随引擎分配 Hash 变化，
+    每次重新计算会让下一次获取认不出已预热的进程
+    """
+    global _engine_options
+    if _engine_options is None:
+        threads = ENGINE_THREADS or max(1, (os.cpu_count() or 1) - 1)  # 留一个核给界面
+        hash_mb = ENGINE_HASH_MB
+        if not hash_mb:
+            # 最多使用可用内存的 1/4，取 2 的幂
+            budget = min(ENGINE_HASH_MAX_MB, (available_memory_mb() or 64) // 4)
+            hash_mb = 16
+            while hash_mb * 2 <= budget:
+                hash_mb *= 2
+        _engine_options = {"Threads": threads, "Hash": hash_mb, "Move Overhead": ENGINE_MOVE_OVERHEAD}
+    return dict(_engine_options)
+
+
+def load_bench():
+    """读取保存的 bench 结果，返回 nodes/second，没有时返回 None"""
+    try:
+        with open(ENGINE_BENCH_PATH, 'r', encoding='utf-8') as f:
+            return json.load(f).get("nps")
+    except (OSError, ValueError):
+        return None
+
+
+def run_bench(engine_path, options=None):
+    """运行引擎的 bench 命令，保存并返回测得的 nodes/second"""
+    options = options or engine_options()
+    command = list(engine_path) if isinstance(engine_path, (list, tuple)) else [engine_path]
+    # stockfish bench [Hash] [Threads] [深度]
+    command += ["bench", str(options["Hash"]), str(options["Threads"]), "13"]
+    proc = subprocess.run(command, capture_output=True, text=True, timeout=600)
+    match = re.search(r"Nodes/second\s*:\s*(\d+)", proc.stdout + proc.stderr)
+    if not match:
+        raise RuntimeError("无法解析 bench 输出")
+    nps = int(match.group(1))
+    with open(ENGINE_BENCH_PATH, 'w', encoding='utf-8') as f:
+        json.dump({"nps": nps, "threads": options["Threads"], "hash": options["Hash"],
+                   "time": int(time.time())}, f, indent=2)
+    return nps
+
+
+def difficulty_limit(level, nps=None, clock=None, turn=chess.WHITE):
+    """按难度等级生成搜索限制
+
+    等级里的 time 指参考机器（ENGINE_REFERENCE_NPS）上的思考时间。
+    有 bench 结果时换算为节点数，并按本机速度设置时间上限，使各台机器强度一致。
+    计时对局传入 clock=(白方剩余秒, 黑方剩余秒, 加秒)，turn 为走棋方：发送 UCI wtime/btime/winc/binc，
+    由引擎按剩余时间分配。time 最长的等级完全由时钟决定；其它按时间划分的等级按与最长等级的
+    时间比例，取时钟每步可用时间的相应份额作为节点数上限，强度随所选时间控制变化。depth/nodes 限制保留。
+    """
+    spec = dict(DIFFICULTY_LEVELS[level][1])
+    if clock:
+        white_time, black_time, increment = clock
+        if "time" in spec:
+            strongest = max(s.get("time", 0) for _, s in DIFFICULTY_LEVELS)
+            share = spec.pop("time") / strongest
+            if share < 1:
+                budget = clock_think_time(white_time if turn == chess.WHITE else black_time, increment)
+                spec["nodes"] = max(1, int(share * budget * (nps or ENGINE_REFERENCE_NPS)))
+        spec.update(white_clock=max(0.0, white_time), black_clock=max(0.0, black_time),
+                    white_inc=increment, black_inc=increment)
+    elif "time" in spec and nps:
+        spec["nodes"] = int(spec["time"] * ENGINE_REFERENCE_NPS)
+        spec["time"] = spec["nodes"] / nps * 2
+    return chess.engine.Limit(**spec)
+
+
+def clock_think_time(clock, increment):
+    """按剩余时间估计每步的思考时间（秒）：与常见引擎的时间分配相近，剩余时间的 1/30 加上大部分加秒，
+    并留出通讯余量"""
+    return max(0.0, min(clock / 30 + increment * 0.8, clock - ENGINE_MOVE_OVERHEAD / 1000))
+
+
+def estimate_think_time(limit, turn):
+    """估计一次搜索的思考时间（秒），用于后台思考命中后的限时；无法估计时返回 None"""
+    if limit.time:
+        return limit.time
+    clock = limit.white_clock if turn else limit.black_clock
+    if clock is None:
+        return None
+    increment = (limit.white_inc if turn else limit.black_inc) or 0
+    return clock_think_time(clock, increment)
@@ -0,0 +1,145 @@
+"""
+后台引擎线程
+主线程提交局面后立即返回 EngineTask，在 update() 中轮询结果，不阻塞界面
+"""
+
+import threading
+import queue
+import time
+import chess
+import chess.engine
+
+
+class EngineTask:
+    """一次引擎搜索请求（类似 future），由主线程轮询"""
+    def __init__(self, board, limit, options=None, source="engine", cache=None, on_done=None):
+        self.board = board.copy()
+        self.fen = board.fen()
+        self.limit = limit
+        self.options = options or {}
+        self.cache = cache  # 搜索完成后写入的 EvalCache
+        self.source = source  # 走法来源：engine / book / tablebase
+        self.on_done = on_done  # 搜索结束时在工作线程中调用
+        self.move = None
+        self.ponder = None  # 引擎预测的对手应着
+        self.info = {}
+        self.error = None
+        self.elapsed = 0.0  # 实际搜索耗时（秒）
+        self.cancelled = False
+        self.analysis = None
+        self.stop_after = None  # 预测命中后，再搜索多少秒停止
+        self.timer = None
+        self.lock = threading.Lock()
+        self.finished = threading.Event()
+
+    @classmethod
+    def completed(cls, board, move, source):
+        """不经过引擎、直接得到结果的请求（开局库等）"""
+        task = cls(board, None, source=source)
+        task.move = move
+        task.finished.set()
+        return task
+
+    def done(self):
+        return self.finished.is_set()
+
+    def wait(self, timeout=None):
+        return self.finished.wait(timeout)
+
+    def cancel(self):
+        """取消请求；正在搜索时立即让引擎停止"""
+        with self.lock:
+            self.cancelled = True
+            if self.timer is not None:
+                self.timer.cancel()
+            if self.analysis is not None:
+                self.analysis.stop()
+
+    def ponderhit(self, seconds):
+        """后台思考的预测命中：无限搜索改为再搜索 seconds 秒后给出结果"""
+        with self.lock:
+            self.stop_after = seconds
+            if self.analysis is not None:
+                self._start_timer()
+
+    def _start_timer(self):
+        self.timer = threading.Timer(max(0.0, self.stop_after), self.analysis.stop)
+        self.timer.daemon = True
+        self.timer.start()
+
+
+class EngineWorker:
+    def __init__(self, engine):
+        self.engine = engine
+        self.tasks = queue.Queue()
+        self.current = None
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def submit(self, board, limit, cache=None, on_done=None, **options):
+        """提交局面，立即返回 EngineTask；传入 cache 时搜索结果写回评估缓存"""
+        task = EngineTask(board, limit, options, cache=cache, on_done=on_done)
+        self.tasks.put(task)
+        return task
+
+    def cancel_all(self):
+        """取消排队中和正在进行的所有请求"""
+        while True:
+            try:
+                task = self.tasks.get_nowait()
+            except queue.Empty:
+                break
+            if task is not None:
+                task.cancel()
+                task.finished.set()
+        current = self.current
+        if current is not None:
+            current.cancel()
+
+    def stop(self, timeout=1.0):
+        """停止工作线程（不关闭引擎进程）"""
+        self.cancel_all()
+        self.tasks.put(None)
+        self.thread.join(timeout)
+
+    def _run(self):
+        while True:
+            task = self.tasks.get()
+            if task is None:
+                break
+            if task.cancelled:
+                task.finished.set()
+                continue
+            self.current = task
+            start = time.perf_counter()
+            try:
+                self._search(task)
+            except (chess.engine.EngineError, chess.engine.EngineTerminatedError) as e:
+                task.error = e
+                print(f"引擎搜索失败: {e}")
+            except Exception as e:
+                task.error = e
+                print(f"引擎搜索失败: {e}")
+            finally:
+                task.elapsed = time.perf_counter() - start
+                self.current = None
+                task.finished.set()
+                if task.on_done:
+                    task.on_done()
+
+    def _search(self, task):
+        # 用 analysis() 代替 play()：搜索结果相同，但可以从其他线程随时 stop()
+        analysis = self.engine.analysis(task.board, task.limit, **task.options)
+        with task.lock:
+            task.analysis = analysis
+            if task.cancelled:
+                analysis.stop()
+            elif task.stop_after is not None:
+                task._start_timer()
+        best = analysis.wait()
+        task.info = analysis.info
+        if not task.cancelled:
+            task.move = best.move
+            task.ponder = best.ponder
+            if task.cache is not None:
+                task.cache.put(task.board, task.info)
@@ -0,0 +1,106 @@
+"""
+本地评估缓存
+以局面 Zobrist 哈希为键，把引擎的深度、评分、最佳走法和主变保存在 SQLite 中，
+跨会话复用；只有更深的搜索结果才会覆盖已有记录
+"""
+
+import sqlite3
+import threading
+from collections import namedtuple
+import chess
+import chess.engine
+import chess.polyglot
+
+EvalEntry = namedtuple("EvalEntry", ["depth", "score", "best_move", "pv"])
+
+
+def _signed(key):
+    """SQLite 的 INTEGER 是有符号 64 位，把无符号的 Zobrist 哈希映射过去"""
+    return key - (1 << 64) if key >= (1 << 63) else key
+
+
+class EvalCache:
+    def __init__(self, path, max_entries=200000, eviction="oldest"):
+        self.path = path
+        self.max_entries = max_entries
+        self.eviction = eviction  # 'oldest'：先删最早写入的；'shallowest'：先删深度最浅的
+        self.conn = None
+        self.count = 0
+        self.clock = 0  # 写入序号，用于 oldest 淘汰
+        self.lock = threading.Lock()
+
+    def _connect(self):
+        if self.conn is not None:
+            return self.conn
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("""CREATE TABLE IF NOT EXISTS evals (
+                            key INTEGER PRIMARY KEY,
+                            depth INTEGER NOT NULL,
+                            cp INTEGER,
+                            mate INTEGER,
+                            best TEXT,
+                            pv TEXT,
+                            written INTEGER NOT NULL)""")
+        self.count, self.clock = conn.execute("SELECT COUNT(*), COALESCE(MAX(written), 0) FROM evals").fetchone()
+        self.conn = conn
+        return conn
+
+    def get(self, board):
+        """查询局面的缓存结果，没有时返回 None"""
+        key = _signed(chess.polyglot.zobrist_hash(board))
+        try:
+            with self.lock:
+                row = self._connect().execute(
+                    "SELECT depth, cp, mate, best, pv FROM evals WHERE key = ?", (key,)).fetchone()
+        except sqlite3.Error as e:
+            print(f"读取评估缓存失败: {e}")
+            return None
+        if row is None:
+            return None
+        depth, cp, mate, best, pv = row
+        score = chess.engine.PovScore(chess.engine.Mate(mate) if mate is not None else chess.engine.Cp(cp), chess.WHITE)
+        moves = [chess.Move.from_uci(m) for m in pv.split()] if pv else []
+        best_move = chess.Move.from_uci(best) if best else None
+        if best_move is not None and best_move not in board.legal_moves:
+            return None  # 哈希冲突
+        return EvalEntry(depth, score, best_move, moves)
+
+    def put(self, board, info):
+        """写入一次搜索结果（engine 的 info 字典），已有更深或同样深的记录时不覆盖"""
+        if "depth" not in info or "score" not in info or not info.get("pv"):
+            return
+        white = info["score"].white()
+        pv = info["pv"]
+        key = _signed(chess.polyglot.zobrist_hash(board))
+        row = (info["depth"], white.score(), white.mate(), pv[0].uci(), " ".join(m.uci() for m in pv))
+        try:
+            with self.lock:
+                conn = self._connect()
+                self.clock += 1
+                cursor = conn.execute("INSERT OR IGNORE INTO evals (key, depth, cp, mate, best, pv, written) "
+                                      "VALUES (?, ?, ?, ?, ?, ?, ?)", (key, *row, self.clock))
+                if cursor.rowcount:
+                    self.count += 1
+                    if self.count > self.max_entries:
+                        self._evict(conn)
+                else:
+                    # 已有记录：只在新结果更深时覆盖
+                    conn.execute("UPDATE evals SET depth = ?, cp = ?, mate = ?, best = ?, pv = ?, written = ? "
+                                 "WHERE key = ? AND depth < ?", (*row, self.clock, key, info["depth"]))
+        except sqlite3.Error as e:
+            print(f"写入评估缓存失败: {e}")
+
+    def _evict(self, conn):
+        """超过上限时一次删除 10% 的记录"""
+        excess = self.count - int(self.max_entries * 0.9)
+        order = "depth, written" if self.eviction == "shallowest" else "written"
+        conn.execute(f"DELETE FROM evals WHERE key IN (SELECT key FROM evals ORDER BY {order} LIMIT ?)", (excess,))
+        self.count = conn.execute("SELECT COUNT(*) FROM evals").fetchone()[0]
+
+    def close(self):
+        with self.lock:
+            if self.conn is not None:
+                self.conn.close()
+            self.conn = None
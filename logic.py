@@ -1,43 +1,313 @@
 import chess
 import chess.engine
-from constants import STOCKFISH_PATH, BOOK_PATH
-import os
+from constants import (STOCKFISH_PATH, BOOK_PATH, BOOK_CACHE_SIZE, ENGINE_PONDER, ENGINE_IDLE_TIMEOUT,
+                       DIFFICULTY_LEVELS, DEFAULT_DIFFICULTY, SYZYGY_PATH, TABLEBASE_CACHE_SIZE,
+                       ANALYSIS_MULTIPV, ANALYSIS_UPDATE_HZ, EVAL_CACHE_PATH, EVAL_CACHE_MAX_ENTRIES,
+                       EVAL_CACHE_EVICTION, EVAL_CACHE_MIN_DEPTH, REVIEW_DEPTH, REVIEW_WORKERS, REVIEW_HASH_MB,
+                       REVIEW_THRESHOLDS)
+import threading
+import random
 import chess.polyglot
+from collections import OrderedDict
+from book import PolyglotBook, BookMove
+from tablebase import SyzygyTablebase
+from analysis import AnalysisSession
+from evalcache import EvalCache
+from review import GameReview
+from engine_manager import EngineManager
+from engine_worker import EngineTask
+from engine_profile import engine_options, load_bench, run_bench, difficulty_limit, estimate_think_time
 
 class GameLogic:
-    def __init__(self):
+    def __init__(self, engine_manager=None):
         self.board = chess.Board()
+        self.engine_manager = engine_manager or EngineManager(ENGINE_IDLE_TIMEOUT)
+        self.engine_handle = None
         self.engine = None
+        self.worker = None  # 后台引擎线程
+        self.analysis_handle = None
+        self.analysis = None  # 实时分析会话
+        self.review = None  # 对局复盘
+        self.stopped_review = None  # 已取消、工作线程可能仍在运行的复盘
+        self.game_key = object()  # 每局一个新对象，引擎据此在新对局前发送 ucinewgame
+        self.difficulty = DEFAULT_DIFFICULTY
+        self.bench_nps = load_bench()  # 本机 bench 测得的 nodes/second
+        self.benching = False
+        self.bench_status = ""
+        self.ai_task = None  # 正在进行的 AI 搜索请求
+        self.ponder_enabled = ENGINE_PONDER
+        self.ponder_task = None  # 玩家思考期间对预测局面的后台搜索
+        self.expected_reply = None  # 引擎预测的玩家应着
+        self.last_ai_move = None  # (SAN, 来源)，用于面板显示
+        self.level_depths = {}  # (难度, 是否计时) -> (最浅, 最深)：本会话中该等级的搜索达到的深度
         self.player_color = chess.WHITE
+        self.on_update = None  # 后台搜索、分析、复盘或 bench 有新结果时调用（在后台线程中）
+        self.book = PolyglotBook(BOOK_PATH)
+        # 开局书走法的 LRU 缓存：zobrist_hash -> (BookMove, ...)
+        self.book_cache = OrderedDict()
+        self.book_cache_size = BOOK_CACHE_SIZE
+        self.book_cache_hits = 0
+        self.book_cache_misses = 0
+        self.book_generation = 0
+        self.tablebase = SyzygyTablebase(SYZYGY_PATH, TABLEBASE_CACHE_SIZE)
+        self.eval_cache = EvalCache(EVAL_CACHE_PATH, EVAL_CACHE_MAX_ENTRIES, EVAL_CACHE_EVICTION)
 
     def reset(self):
         self.board = chess.Board()
+        self.game_key = object()
+        self.last_ai_move = None
 
     def start_engine(self):
+        """从引擎管理器获取常驻引擎（已预热时无需重新启动进程）"""
         if not self.engine:
             try:
-                self.engine = chess.engine.SimpleEngine.popen_uci(STOCKFISH_PATH)
+                self.engine_handle = self.engine_manager.acquire(STOCKFISH_PATH, engine_options())
+                self.engine = self.engine_handle.engine
+                self.worker = self.engine_handle.worker
             except:
                 print("引擎启动失败")
 
     def stop_engine(self):
-        if self.engine: self.engine.quit()
+        """取消进行中的搜索并归还引擎，进程保持运行供下一局使用"""
+        self.cancel_ai_move()
+        if self.engine_handle:
+            self.engine_manager.release(self.engine_handle)
+        self.engine_handle = None
+        self.worker = None
+        self.engine = None
+
+    def start_analysis(self):
+        """开启实时分析（使用独立的引擎进程）"""
+        if self.analysis:
+            return
+        try:
+            self.analysis_handle = self.engine_manager.acquire(STOCKFISH_PATH, engine_options(), role="analysis")
+        except:
+            print("引擎启动失败")
+            return
+        self.analysis = AnalysisSession(self.analysis_handle.engine, ANALYSIS_MULTIPV, ANALYSIS_UPDATE_HZ,
+                                        eval_cache=self.eval_cache, on_update=self.on_update)
+        self.analysis.set_position(self.board)
+
+    def stop_analysis(self):
+        if self.analysis:
+            self.analysis.stop()
+            self.engine_manager.release(self.analysis_handle)
+        self.analysis = None
+        self.analysis_handle = None
+
+    def update_analysis(self):
+        """每帧调用：局面变化时让分析立即切换到新局面，返回最新分析结果"""
+        if not self.analysis:
+            return None
+        self.analysis.set_position(self.board)
+        return self.analysis.snapshot
+
+    def start_review(self):
+        """对局结束后并行复盘整盘棋（后台进行，通过 self.review 读取进度）；复盘进行中时忽略"""
+        if self.review and not self.review.finished:
+            return
+        self.stop_review()
+        self.review = GameReview(self.engine_manager, STOCKFISH_PATH, self.board.root(), self.board.move_stack,
+                                 chess.engine.Limit(depth=REVIEW_DEPTH), REVIEW_WORKERS, REVIEW_HASH_MB,
+                                 REVIEW_THRESHOLDS, on_update=self.on_update, eval_cache=self.eval_cache,
+                                 after=self.stopped_review)
+        self.stopped_review = None
+
+    def stop_review(self):
+        if self.review:
+            self.review.cancel()
+            if not self.review.finished:
+                self.stopped_review = self.review  # 下一次复盘等它的线程结束后再使用同一批引擎
+        self.review = None
+
+    def shutdown_engines(self):
+        """退出程序时关闭所有引擎进程"""
+        self.stop_review()
+        self.stop_analysis()
+        self.stop_engine()
+        self.eval_cache.close()
+        self.engine_manager.shutdown()
+
+    def get_ai_limit(self, clock=None, turn=None):
+        return difficulty_limit(self.difficulty, self.bench_nps, clock, self.board.turn if turn is None else turn)
+
+    def cycle_difficulty(self):
+        self.difficulty = (self.difficulty + 1) % len(DIFFICULTY_LEVELS)
+        return DIFFICULTY_LEVELS[self.difficulty][0]
+
+    def start_bench(self):
+        """后台运行引擎 bench（非阻塞），结果保存到 ENGINE_BENCH_PATH"""
+        if self.benching:
+            return
+
+        def do_bench():
+            try:
+                self.bench_nps = run_bench(STOCKFISH_PATH)
+                self.bench_status = f"本机速度: {self.bench_nps // 1000} kN/s"
+            except Exception as e:
+                self.bench_status = f"测试失败: {str(e)[:30]}"
+            finally:
+                self.benching = False
+                if self.on_update:
+                    self.on_update()
+
+        self.benching = True
+        self.bench_status = "正在测试引擎速度..."
+        threading.Thread(target=do_bench, daemon=True).start()
+
+    def request_ai_move(self, clock=None):
+        """获取 AI 走法（非阻塞），已有请求时直接返回该请求
+
+        依次尝试：开局库 -> 残局库 -> 评估缓存 -> 引擎搜索。返回的 EngineTask.source 标明走法来源。
+        clock: 计时对局中为 (白方剩余秒, 黑方剩余秒, 加秒)，引擎按真实时钟分配时间
+        """
+        if not self.worker:
+            return None
+        if self.board.is_game_over():
+            self.cancel_ai_move()  # 玩家的走法结束了对局：停止后台思考（否则无限搜索会一直占用引擎）
+            return None
+        if self.ai_task is None:
+            self.ai_task = self._lookup_ai_move(clock) or self._search_ai_move(clock)
+        return self.ai_task
+
+    def _lookup_ai_move(self, clock=None):
+        """不经过引擎就能确定的走法（开局库、残局库、与难度相当的缓存结果），找不到时返回 None"""
+        if book_move := self.pick_book_move():
+            source, move = "book", book_move
+        elif tb_move := self.tablebase.best_move(self.board):
+            source, move = "tablebase", tb_move
+        elif cached_move := self.get_cached_move(clock):
+            source, move = "cache", cached_move
+        else:
+            return None
+        if self.ponder_task:
+            self.ponder_task.cancel()
+            self.ponder_task = None
+        return EngineTask.completed(self.board, move, source)
+
+    def _search_ai_move(self, clock):
+        limit = self.get_ai_limit(clock)
+        think_time = estimate_think_time(limit, self.board.turn)
+        ponder_task, self.ponder_task = self.ponder_task, None
+        if ponder_task and ponder_task.fen == self.board.fen():
+            if ponder_task.limit is not None and not (ponder_task.done() and ponder_task.move is None):
+                # 预测命中，后台思考用的就是本等级的限制：直接沿用（已完成时立即得到走法）
+                return ponder_task
+            if ponder_task.limit is None and not ponder_task.done() and think_time is not None:
+                # 预测命中（ponderhit）：沿用已在进行的无限搜索，只再给正常的思考时间
+                ponder_task.ponderhit(think_time)
+                return ponder_task
+        if ponder_task:
+            ponder_task.cancel()
+        return self.worker.submit(self.board, limit, cache=self.eval_cache, on_done=self.on_update, game=self.game_key)
+
+    def poll_ai_move(self):
+        """检查后台搜索是否完成，完成且局面未变时返回走法，否则返回 None"""
+        task = self.ai_task
+        if task is None or not task.done():
+            return None
+        self.ai_task = None
+        if task.move is None or task.fen != self.board.fen():
+            return None  # 搜索失败、被取消或局面已改变，丢弃结果
+        if task.source == "engine" and task.info.get("depth"):
+            key = (self.difficulty, task.limit is not None and task.limit.white_clock is not None)
+            depth = task.info["depth"]
+            lo, hi = self.level_depths.get(key, (depth, depth))
+            self.level_depths[key] = (min(lo, depth), max(hi, depth))
+        self.expected_reply = task.ponder
+        self.last_ai_move = (self.board.san(task.move), task.source)
+        return task.move
+
+    def get_cached_move(self, clock=None):
+        """评估缓存中与当前难度相当的最佳走法，没有时返回 None
+
+        缓存结果不能比难度等级更强（否则低难度会直接走出分析面板写入的满强度走法），也不能更弱：
+        完全由时钟决定的等级使用深度不低于 EVAL_CACHE_MIN_DEPTH 的结果；限深度的等级只使用同样深度的结果；
+        限时 / 限节点的等级使用本会话中该等级的搜索实际达到的深度范围内的结果
+        """
+        limit = self.get_ai_limit(clock)
+        if limit.time is None and limit.nodes is None and limit.depth is None:
+            lo, hi = EVAL_CACHE_MIN_DEPTH, None
+        elif limit.time is None and limit.nodes is None:
+            lo = hi = limit.depth
+        else:
+            depths = self.level_depths.get((self.difficulty, limit.white_clock is not None))
+            if depths is None:
+                return None  # 还不知道这一等级能搜索多深
+            lo, hi = depths
+        entry = self.eval_cache.get(self.board)
+        if entry is None or entry.best_move is None:
+            return None
+        if entry.depth < lo or (hi is not None and entry.depth > hi):
+            return None
+        return entry.best_move
+
+    def pick_book_move(self):
+        """按开局库权重随机选择走法，不在库中时返回 None"""
+        entries = self.get_book_entries()
+        if not entries:
+            return None
+        return random.choices(entries, weights=[e.weight for e in entries])[0].move
+
+    def start_ponder(self, clock=None):
+        """AI 走完后调用：在玩家思考期间搜索预测应着之后的局面
+
+        后台思考使用与正常走子相同的 time / depth / nodes 限制，低难度等级不会因为后台思考变强；
+        只有完全由时钟决定思考时间的等级才做无限搜索，命中后再按时钟给出思考时间
+        """
+        if not self.ponder_enabled or not self.worker or self.ponder_task:
+            return
+        reply, self.expected_reply = self.expected_reply, None
+        if reply is None or reply not in self.board.legal_moves:
+            return
+        predicted = self.board.copy()
+        predicted.push(reply)
+        if predicted.is_game_over():
+            return
+        level = self.get_ai_limit(clock, predicted.turn)
+        limit = None  # 无限搜索，直到命中或取消
+        if level.time is not None or level.depth is not None or level.nodes is not None:
+            limit = chess.engine.Limit(time=level.time, depth=level.depth, nodes=level.nodes)
+        self.ponder_task = self.worker.submit(predicted, limit, cache=self.eval_cache, on_done=self.on_update,
+                                              game=self.game_key)
+
+    def cancel_ai_move(self):
+        if self.ai_task:
+            self.ai_task.cancel()
+            self.ai_task = None
+        if self.ponder_task:
+            self.ponder_task.cancel()
+            self.ponder_task = None
+        self.expected_reply = None
 
     def get_ai_move(self):
-        if self.engine and not self.board.is_game_over():
-            result = self.engine.play(self.board, chess.engine.Limit(time=0.1))
-            return result.move
+        """阻塞式获取 AI 走法"""
+        if self.request_ai_move():
+            self.ai_task.wait()
+            return self.poll_ai_move()
         return None
 
-    def get_external_book_moves(self):
-        moves = []
-        if os.path.exists(BOOK_PATH):
+    def sync_moves(self, moves):
+        """把服务器的 UCI 走法列表同步到当前棋盘：只走新增的走法，与本地历史分叉时才回退到分叉点。
+        返回是否有变化"""
+        stack = self.board.move_stack
+        # 逐步比较整个共同前缀（只是字符串比较，真正的开销在 push_uci），找出分叉点
+        common = 0
+        for local, remote in zip(stack, moves):
+            if local.uci() != remote:
+                break
+            common += 1
+        changed = common < len(stack) or common < len(moves)
+        while len(stack) > common:
+            self.board.pop()
+        for uci in moves[common:]:
             try:
-                with chess.polyglot.open_reader(BOOK_PATH) as reader:
-                    for entry in reader.find_all(self.board):
-                        moves.append(entry.move) 
-            except: pass
-        return moves
+                self.board.push_uci(uci)
+            except ValueError as e:
+                print(f"同步走法失败: {uci} ({e})")
+                break
+        return changed
 
     def get_sq_from_coords(self, col, row):
         """精准修复：坐标转换"""
@@ -59,14 +329,43 @@ class GameLogic:
         else:
             return f, 7 - r
     
+    def get_book_entries(self, board=None):
+        """获取局面的开局书记录（走法、权重、learn 值），按局面缓存"""
+        board = self.board if board is None else board
+        key = chess.polyglot.zobrist_hash(board)
+        entries = self.book_cache.get(key)
+        if entries is not None:
+            self.book_cache.move_to_end(key)
+            self.book_cache_hits += 1
+            return entries
+        self.book_cache_misses += 1
+        entries = tuple(BookMove(e.move, e.weight, e.learn) for e in self.book.find_all(board, key))
+        if self.book.generation != self.book_generation:
+            # 开局书文件已重新加载，旧的缓存作废
+            self.book_cache.clear()
+            self.book_generation = self.book.generation
+        self.book_cache[key] = entries
+        while len(self.book_cache) > self.book_cache_size:
+            self.book_cache.popitem(last=False)
+        return entries
+
+    def clear_book_cache(self):
+        self.book_cache.clear()
+        self.book_cache_hits = 0
+        self.book_cache_misses = 0
+
+    def get_tablebase_hint(self):
+        """残局库提示：(最佳走法, wdl, dtz)，不在残局库中时返回 None"""
+        probed = self.tablebase.probe(self.board)
+        if probed is None:
+            return None
+        return self.tablebase.best_move(self.board), probed[0], probed[1]
+
+    def adjudicate(self):
+        """残局库判定结果（'1-0' / '0-1' / '1/2-1/2'），无法判定时返回 None"""
+        return self.tablebase.result(self.board)
+
     def get_external_book_moves(self):
         """仅从外部 .bin 文件获取建议走法"""
-        moves = []
-        if os.path.exists(BOOK_PATH):
-            try:
-                with chess.polyglot.open_reader(BOOK_PATH) as reader:
-                    for entry in reader.find_all(self.board):
-                        moves.append(entry.move)
-            except Exception as e:
-                print(f"读取外部开局书失败: {e}")
-        return moves
\ No newline at end of file
+        return [entry.move for entry in self.get_book_entries()]
+
@@ -1,8 +1,12 @@
-import pygame, sys, os, chess
+import pygame, sys, os, math, time, chess
 from constants import *
 from logic import GameLogic
 from renderer import Renderer
-from network import LichessClient, BERSERK_AVAILABLE
+from network import LichessClient, BERSERK_AVAILABLE, GAME_OVER_STATUSES
+from profiler import FrameProfiler
+
+# 后台线程（引擎、分析、复盘、网络）有新结果时投递的事件，用于唤醒主循环
+WAKE_EVENT = pygame.event.custom_type()
 
 class ChessApp:
     def __init__(self):
@@ -12,6 +16,14 @@ class ChessApp:
         self.logic = GameLogic()
         self.ui = Renderer(self.screen)
         self.lichess = LichessClient()
+        self.logic.on_update = self._wake
+        self.lichess.on_event = self._wake
+        # 帧耗时统计；主线程中的网络请求和引擎启停单独计时，便于发现阻塞界面的调用
+        self.profiler = FrameProfiler(PROFILER_HISTORY)
+        self.profiler.instrument(self.lichess, "net", ["connect", "create_challenge", "challenge_player", "accept_challenge",
+                                                       "get_pending_challenges", "make_move", "resign", "disconnect"])
+        self.profiler.instrument(self.logic, "engine", ["start_engine", "stop_engine", "start_analysis", "stop_analysis",
+                                                        "start_review", "get_ai_move"])
         self.lichess_token = ""
         self.lichess_opponent = ""
         self.lichess_status = ""
@@ -20,11 +32,14 @@ class ChessApp:
         self.input_target = None  # 'token' 或 'opponent'
         self.reset_game()
         self.state = 'MENU'
+        # 局部重绘
+        self.full_redraw = True  # 下一帧整屏重绘
+        self.dirty_rects = []  # 下一帧需要重绘的区域
+        self.frame_state = {}  # 上一帧绘制时的界面状态，用于找出变化的区域
 
     def reset_game(self):
         self.logic.reset()
-        self.logic.stop_engine()  # 停止AI引擎
-        self.logic.engine = None  # 清除引擎引用
+        self.logic.stop_engine()  # 取消进行中的搜索，引擎进程保持预热
         self.selected_sq = None
         self.ai_timer = 0
         self.learning_data = {"step": 0, "seq": [], "title": ""}
@@ -41,15 +56,40 @@ class ChessApp:
         self.last_tick = None  # 上次计时时间戳
         self.time_expired = False  # 是否超时
         self.game_mode = None  # 'pvp', 'ai', 'learning', 'online'
+        self.show_tablebase = False  # 是否显示残局库提示
+        self.logic.stop_analysis()  # 关闭实时分析（引擎进程保持预热）
+        self.logic.stop_review()
+        self.adjudicated = None  # 残局库判定的结果
+        self.online_pending = None  # 已在本地走出、等待服务器确认的走法 (半回合序号, UCI)
+        self.online_notice = ""  # 联机走法被拒绝等提示
+        self.online_pending_deadline = None  # 重发被拒绝后等待对局状态确认的截止时间（毫秒）
 
-    def handle_events(self):
-        for event in pygame.event.get():
+    def handle_events(self, events=None):
+        for event in pygame.event.get() if events is None else events:
             if event.type == pygame.QUIT: self.quit()
+            # 鼠标移动只影响悬停效果、后台事件只影响各自的区域（由 _collect_dirty 处理），其它输入都整屏重绘
+            if event.type not in (pygame.MOUSEMOTION, WAKE_EVENT) or self.dragging_scrollbar:
+                self.invalidate()
             if event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
                 if self.input_active:
                     self.input_active = False  # 仅关闭输入框
                 else:
                     self.reset_game(); self.state = 'MENU'
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                self.profiler.overlay = not self.profiler.overlay  # F3 切换帧耗时叠加层
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_F4:
+                path = os.path.join(PROFILE_CAPTURE_DIR, f"profile_{time.strftime('%Y%m%d_%H%M%S')}.pstats")
+                self.profiler.start_capture(PROFILE_CAPTURE_FRAMES, path)  # F4 采样接下来 N 帧
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_t and not self.input_active:
+                if self.state in ('PLAYING', 'LEARNING'):
+                    self.show_tablebase = not self.show_tablebase  # T 键切换残局库提示
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_a and not self.input_active:
+                if self.state in ('PLAYING', 'LEARNING'):
+                    # A 键开关实时分析面板
+                    if self.logic.analysis:
+                        self.logic.stop_analysis()
+                    else:
+                        self.logic.start_analysis()
             
             if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:  # 只响应左键点击
                 if self.state == 'OPENING_MENU':
@@ -145,14 +185,14 @@ class ChessApp:
         
         # 提示文字
         hint = "输入 Token:" if self.input_target == 'token' else "输入用户名:"
-        self.screen.blit(self.ui.small_font.render(hint, True, (200, 200, 200)), (70, HEIGHT//2 - 45))
+        self.screen.blit(self.ui.render_text(self.ui.small_font, hint, (200, 200, 200)), (70, HEIGHT//2 - 45))
         
         # 输入内容
         display_text = self.input_text + ("|" if pygame.time.get_ticks() % 1000 < 500 else "")
-        self.screen.blit(self.ui.small_font.render(display_text, True, (255, 255, 255)), (70, HEIGHT//2 - 5))
+        self.screen.blit(self.ui.render_text(self.ui.small_font, display_text, (255, 255, 255)), (70, HEIGHT//2 - 5))
         
         # 提示 (Enter确认/ESC取消)
-        self.screen.blit(self.ui.small_font.render("Enter确认 / ESC取消", True, (150, 150, 150)), (70, HEIGHT//2 + 30))
+        self.screen.blit(self.ui.render_text(self.ui.small_font, "Enter确认 / ESC取消", (150, 150, 150)), (70, HEIGHT//2 + 30))
 
     def on_click(self, pos):
         if self.state == 'MENU':
@@ -258,10 +298,16 @@ class ChessApp:
                 self.state = 'PLAYING'
                 self.last_tick = pygame.time.get_ticks()
                 self.ai_timer = pygame.time.get_ticks()
+            elif pygame.Rect(WIDTH//4, 410, WIDTH//2, 50).collidepoint(pos):
+                self.logic.cycle_difficulty()
+            elif pygame.Rect(WIDTH//4, 480, WIDTH//2, 50).collidepoint(pos):
+                self.logic.start_bench()  # 后台测试引擎速度
 
         elif self.state in ['PLAYING', 'LEARNING', 'PROMOTING']:
             if pygame.Rect(WIDTH-240, BOARD_HEIGHT+70, 220, 40).collidepoint(pos): 
                 self.reset_game(); self.state = 'MENU'; return
+            elif self._game_finished() and pygame.Rect(WIDTH-240, BOARD_HEIGHT+20, 220, 40).collidepoint(pos):
+                self.logic.start_review(); return
             elif self.state == 'PROMOTING': self.handle_promotion(pos)
             elif pos[1] <= BOARD_HEIGHT: self.handle_move(pos)
         
@@ -276,8 +322,11 @@ class ChessApp:
                 self.handle_online_move(pos)
 
     def handle_move(self, pos):
-        # 超时后不能走棋
-        if self.time_expired:
+        # 超时或残局库判定结束后不能走棋
+        if self.time_expired or self.adjudicated:
+            return
+        # 人机对战中 AI 在后台思考时不能替它走棋（否则局面改变，AI 的结果会被丢弃）
+        if self.game_mode == 'ai' and self.logic.board.turn != self.logic.player_color:
             return
         # 修复：获取格子坐标
         sq = self.logic.get_sq_from_coords(pos[0]//SQ_SIZE, pos[1]//SQ_SIZE)
@@ -375,22 +424,19 @@ class ChessApp:
                     move = chess.Move(from_sq, to_sq, promotion=chess.QUEEN)
             
             if move in self.logic.board.legal_moves:
-                # 发送走法到 Lichess
-                if self.lichess.make_move(move.uci()):
+                # 先在本地走出，再由后台线程发送到 Lichess；被拒绝时在 update 中撤回
+                if self.lichess.send_move(move.uci()):
+                    self.online_pending = (len(self.logic.board.move_stack), move.uci())
+                    self.online_pending_deadline = None
+                    self.online_notice = ""
                     self.logic.board.push(move)
             
             self.selected_sq = None
 
     def update(self):
-        # AI逻辑（超时后不能走棋）
-        if self.state == 'PLAYING' and self.logic.engine and self.logic.board.turn != self.logic.player_color and not self.time_expired:
-            if self.ai_timer > 0 and pygame.time.get_ticks() - self.ai_timer >= 1000:
-                if mv := self.logic.get_ai_move():
-                    self._do_move(mv)
-                self.ai_timer = 0
-        
         # 时钟计时（超时后停止计时）- 支持本地和联机模式
-        if self.state in ('PLAYING', 'ONLINE') and self.time_enabled and not self.time_expired and not self.logic.board.is_game_over():
+        # 先结算时钟再处理 AI 走法，AI 的思考时间记在自己的时钟上
+        if self.state in ('PLAYING', 'ONLINE') and self.time_enabled and not self.time_expired and not self.adjudicated and not self.logic.board.is_game_over():
             current_tick = pygame.time.get_ticks()
             if self.last_tick:
                 elapsed = (current_tick - self.last_tick) / 1000.0
@@ -406,6 +452,30 @@ class ChessApp:
                         self.time_expired = True
             self.last_tick = current_tick
         
+        # 残局库判定（需开启 TABLEBASE_ADJUDICATE）
+        if TABLEBASE_ADJUDICATE and self.state == 'PLAYING' and self.logic.engine and not self.adjudicated:
+            self.adjudicated = self.logic.adjudicate()
+
+        # 超时、判定或将死等结束对局后，取消进行中的 AI 搜索和后台思考
+        if (self.state == 'PLAYING' and (self.logic.ai_task or self.logic.ponder_task)
+                and (self.time_expired or self.adjudicated or self.logic.board.is_game_over())):
+            self.logic.cancel_ai_move()
+
+        # AI逻辑（超时或判定结束后不能走棋）
+        if self.state == 'PLAYING' and self.logic.engine and self.logic.board.turn != self.logic.player_color and not self.time_expired and not self.adjudicated:
+            # 计时对局中 AI 不额外等待，思考时间全部来自自己的时钟
+            ai_delay = 0 if self.time_enabled else 1000
+            if self.ai_timer > 0 and pygame.time.get_ticks() - self.ai_timer >= ai_delay:
+                self.logic.request_ai_move(self._ai_clock())  # 后台搜索，不阻塞界面
+                self.ai_timer = 0
+            if mv := self.logic.poll_ai_move():
+                self._do_move(mv)
+                self.logic.start_ponder(self._ai_clock())  # 玩家思考期间引擎继续搜索（需开启 ENGINE_PONDER）
+        
+        # 实时分析跟随当前局面
+        if self.state in ('PLAYING', 'LEARNING', 'PROMOTING'):
+            self.logic.update_analysis()
+
         # 检查匹配状态（联机菜单中）
         if self.state == 'ONLINE_MENU':
             is_matching, result = self.lichess.check_match_status()
@@ -416,25 +486,73 @@ class ChessApp:
                 if success:
                     self._start_online_game()
         
-        # 联机游戏更新
+        # 联机游戏更新：每帧取出全部事件，连续的局面快照已合并为最新一个
         if self.state == 'ONLINE':
-            event = self.lichess.get_opponent_move()
-            if event:
+            for event in self.lichess.drain_events():
                 event_type = event[0]
-                if event_type in ('full', 'state'):
+                if event_type == 'error':
+                    self.online_notice = f"对局连接中断: {event[1][:30]}"
+                elif event_type in ('full', 'state'):
                     moves_str = event[1]
                     moves = moves_str.split() if moves_str else []
-                    # 同步棋盘状态
-                    self.logic.board = chess.Board()
-                    for m in moves:
-                        try:
-                            self.logic.board.push_uci(m)
-                        except:
-                            pass
+                    moves = self._match_pending_move(moves)
+                    # 同步棋盘状态：只走新增的走法，选中的棋子仍在原处时保留选中
+                    if self.logic.sync_moves(moves) and self.selected_sq is not None:
+                        piece = self.logic.board.piece_at(self.selected_sq)
+                        if not piece or piece.color != self.logic.player_color:
+                            self.selected_sq = None
                     # 检查游戏是否结束
-                    if len(event) > 2 and event[2] in ('mate', 'resign', 'stalemate', 'draw'):
+                    if len(event) > 2 and event[2] in GAME_OVER_STATUSES:
                         self.lichess_status = f"游戏结束: {event[2]}"
+                elif event_type == 'rejected':
+                    self._rollback_pending_move(event[1], f"走法 {event[1]} 被拒绝，已撤回")
+                elif event_type == 'failed':
+                    # 服务器如果其实已收到，之后的对局状态会把这一步同步回来
+                    self._rollback_pending_move(event[1], f"走法 {event[1]} 发送失败，已撤回")
+                elif self.online_pending is None or self.online_pending[1] != event[1]:
+                    pass  # 已被对局状态确认或撤回的走法
+                elif event_type == 'unconfirmed':
+                    self.online_notice = f"走法 {event[1]} 发送失败，正在重发"
+                elif event_type == 'ambiguous':
+                    # 之前的请求可能已经生效：等对局状态确认，超时仍未确认再撤回
+                    self.online_pending_deadline = pygame.time.get_ticks() + LICHESS_MOVE_CONFIRM_TIMEOUT * 1000
+            if (self.online_pending is not None and self.online_pending_deadline is not None
+                    and pygame.time.get_ticks() >= self.online_pending_deadline):
+                self._rollback_pending_move(self.online_pending[1], f"走法 {self.online_pending[1]} 未被服务器确认，已撤回")
+
+    def _match_pending_move(self, moves):
+        """用服务器的走法列表确认本地先走的一步；服务器还没收到时保留这一步，避免棋子闪回"""
+        if self.online_pending is None:
+            return moves
+        ply, uci = self.online_pending
+        if len(moves) <= ply:
+            return moves + [uci] if len(moves) == ply else moves
+        self.online_notice = f"走法 {uci} 未被服务器接受" if moves[ply] != uci else ""
+        self.online_pending = None
+        self.online_pending_deadline = None
+        return moves
+
+    def _rollback_pending_move(self, uci, notice):
+        """撤回本地先走、未被服务器接受的一步并提示"""
+        if self.online_pending is None or self.online_pending[1] != uci:
+            return
+        ply, _ = self.online_pending
+        self.online_pending = None
+        self.online_pending_deadline = None
+        stack = self.logic.board.move_stack
+        if len(stack) == ply + 1 and stack[-1].uci() == uci:
+            self.logic.board.pop()
+        self.online_notice = notice
     
+    def _game_finished(self):
+        return self.state == 'PLAYING' and (self.logic.board.is_game_over() or self.time_expired or self.adjudicated)
+
+    def _ai_clock(self):
+        """计时对局中返回 (白方剩余, 黑方剩余, 加秒)，供引擎按时钟分配思考时间"""
+        if not self.time_enabled:
+            return None
+        return self.white_time, self.black_time, self.time_increment
+
     def _do_move(self, move):
         """执行走法并处理计时"""
         moving_color = self.logic.board.turn
@@ -446,12 +564,109 @@ class ChessApp:
             else:
                 self.black_time += self.time_increment
 
+    def invalidate(self, rect=None):
+        """标记需要重绘的区域，rect 为 None 时整屏重绘"""
+        if rect is None:
+            self.full_redraw = True
+        else:
+            self.dirty_rects.append(pygame.Rect(rect))
+
+    def _square_rect(self, sq):
+        c, r = self.logic.get_coords_from_sq(sq)
+        return pygame.Rect(c * SQ_SIZE, r * SQ_SIZE, SQ_SIZE, SQ_SIZE)
+
+    def _collect_dirty(self):
+        """与上一帧的界面状态比较，记录需要重绘的区域"""
+        board = self.logic.board
+        analysis, review = self.logic.analysis, self.logic.review
+        # 这些状态一变就整屏重绘
+        scene = (self.state, self.game_mode, self.input_active, self.input_target, self.input_text,
+                 self.lichess_status, self.online_notice, self.lichess.connected, self.lichess.matching, self.scroll_offset,
+                 self.dragging_scrollbar, self.time_enabled, self.time_expired, self.adjudicated,
+                 self.show_tablebase, self.learning_data["step"], self.logic.player_color,
+                 self.logic.difficulty, self.logic.benching, self.logic.bench_status, self.logic.last_ai_move,
+                 analysis is None, review is None, review is not None and review.finished,
+                 # 挑战列表来自网络，每 2 秒刷新一次
+                 pygame.time.get_ticks() // 2000 if self.state == 'CHALLENGES' else None)
+        pieces = (board.pawns, board.knights, board.bishops, board.rooks, board.queens, board.kings,
+                  board.occupied_co[chess.WHITE], board.occupied_co[chess.BLACK])
+        clocks = (int(self.white_time), int(self.black_time)) if self.time_enabled and self.white_time is not None else None
+        mouse = pygame.mouse.get_pos()
+        hovered = next((r for r in self.ui.hover_rects if r.collidepoint(mouse)), None)
+        current = {
+            "scene": scene,
+            "pieces": pieces,
+            "selected": self.selected_sq,
+            "clocks": clocks,
+            "analysis": analysis.version if analysis else None,
+            "review": review.done_count if review else None,
+            "cursor": self.input_active and pygame.time.get_ticks() % 1000 < 500,
+            "hovered": hovered,
+        }
+        prev, self.frame_state = self.frame_state, current
+        if not prev or prev["scene"] != scene:
+            self.full_redraw = True
+            return
+
+        if prev["pieces"] != pieces:
+            if self.state == 'LEARNING' or self.show_tablebase:
+                self.invalidate((0, 0, BOARD_SIZE, BOARD_HEIGHT))  # 提示箭头随局面变化
+            else:
+                changed = 0
+                for old, new in zip(prev["pieces"], pieces):
+                    changed |= old ^ new
+                for sq in chess.scan_forward(changed):
+                    self.invalidate(self._square_rect(sq))
+            self.invalidate((0, BOARD_HEIGHT, WIDTH, HEIGHT - BOARD_HEIGHT))  # 状态栏
+            for rect in self.ui.clock_rects:  # 轮到谁走的高亮
+                self.invalidate(rect)
+        if prev["selected"] != self.selected_sq:
+            for sq in (prev["selected"], self.selected_sq):
+                if sq is not None:
+                    self.invalidate(self._square_rect(sq))
+        if prev["clocks"] != clocks:
+            for rect in self.ui.clock_rects:
+                self.invalidate(rect)
+        if prev["analysis"] != current["analysis"] and self.ui.analysis_rect:
+            self.invalidate(self.ui.analysis_rect)
+        if prev["review"] != current["review"]:
+            self.invalidate((BOARD_SIZE, 0, SIDE_PANEL_WIDTH, BOARD_HEIGHT))
+        if prev["cursor"] != current["cursor"]:
+            self.invalidate((50, HEIGHT//2 - 60, WIDTH - 100, 120))
+        if prev["hovered"] != hovered:
+            for rect in (prev["hovered"], hovered):
+                if rect is not None:
+                    self.invalidate(rect.inflate(8, 8))  # 包含按钮阴影
+        if self.profiler.overlay:
+            self.invalidate(self.ui.profiler_rect)
+
     def draw(self):
+        if not DIRTY_RECT_RENDERING:
+            self._draw_scene()
+            pygame.display.flip()
+            return
+        self._collect_dirty()
+        if self.full_redraw:
+            self._draw_scene()
+            with self.profiler.stage("present"):
+                pygame.display.flip()
+        elif self.dirty_rects:
+            # 只在变化区域内重绘：裁剪区外的绘制由 SDL 直接跳过，只把这些区域推送到屏幕
+            self.screen.set_clip(self.dirty_rects[0].unionall(self.dirty_rects[1:]))
+            self._draw_scene()
+            self.screen.set_clip(None)
+            with self.profiler.stage("present"):
+                pygame.display.update(self.dirty_rects)
+        self.full_redraw = False
+        self.dirty_rects = []
+
+    def _draw_scene(self):
+        self.ui.hover_rects = []
         self.screen.fill(BG_COLOR)
         if self.state == 'MENU':
             self.ui.draw_menu_background()
             # 标题
-            title = self.ui.font.render("国际象棋", True, (255, 255, 255))
+            title = self.ui.render_text(self.ui.font, "国际象棋", (255, 255, 255))
             self.screen.blit(title, (WIDTH//2 - title.get_width()//2, 120))
             # 按钮
             self.ui.draw_button("双人模式", pygame.Rect(WIDTH//4, 220, WIDTH//2, 50))
@@ -460,13 +675,13 @@ class ChessApp:
             self.ui.draw_button("联机对战", pygame.Rect(WIDTH//4, 430, WIDTH//2, 50), (90, 45, 90))
         
         elif self.state == 'ONLINE_MENU':
-            title = self.ui.font.render("Lichess 联机", True, (255, 255, 255))
+            title = self.ui.render_text(self.ui.font, "Lichess 联机", (255, 255, 255))
             self.screen.blit(title, (WIDTH//2 - title.get_width()//2, 30))
             
             # 状态显示
             status_color = (100, 255, 100) if self.lichess.connected else (255, 150, 150)
             status_txt = f"状态: {self.lichess_status}" if self.lichess_status else ("已连接" if self.lichess.connected else "未连接")
-            self.screen.blit(self.ui.small_font.render(status_txt, True, status_color), (20, 80))
+            self.screen.blit(self.ui.render_text(self.ui.small_font, status_txt, status_color), (20, 80))
             
             # Token 输入
             token_display = self.lichess_token[:20] + "..." if len(self.lichess_token) > 20 else (self.lichess_token or "点击输入Token")
@@ -485,7 +700,7 @@ class ChessApp:
                 self.ui.draw_button(f"挑战: {opp_text}", pygame.Rect(WIDTH//4, 360, WIDTH//2, 50), btn_color2)
                 self.ui.draw_button("查看挑战", pygame.Rect(WIDTH//4, 440, WIDTH//2, 50), (70, 70, 70))
             else:
-                hint = self.ui.small_font.render("请先在 lichess.org 获取 API Token", True, (180, 180, 180))
+                hint = self.ui.render_text(self.ui.small_font, "请先在 lichess.org 获取 API Token", (180, 180, 180))
                 self.screen.blit(hint, (WIDTH//2 - hint.get_width()//2, 280))
             
             self.ui.draw_button("返回主菜单", pygame.Rect(WIDTH//4, HEIGHT-70, WIDTH//2, 45), (100, 50, 50))
@@ -495,7 +710,7 @@ class ChessApp:
                 self._draw_input_box()
         
         elif self.state == 'CHALLENGES':
-            title = self.ui.font.render("待处理的挑战", True, (255, 255, 255))
+            title = self.ui.render_text(self.ui.font, "待处理的挑战", (255, 255, 255))
             self.screen.blit(title, (WIDTH//2 - title.get_width()//2, 30))
             
             challenges = self.lichess.get_pending_challenges()
@@ -506,32 +721,36 @@ class ChessApp:
                     self.ui.draw_button(f"来自: {challenger}", pygame.Rect(50, y, WIDTH-100, 40), (45, 90, 45))
                     y += 50
             else:
-                hint = self.ui.small_font.render("暂无挑战", True, (180, 180, 180))
+                hint = self.ui.render_text(self.ui.small_font, "暂无挑战", (180, 180, 180))
                 self.screen.blit(hint, (WIDTH//2 - hint.get_width()//2, 200))
             
             self.ui.draw_button("返回", pygame.Rect(WIDTH//4, HEIGHT-70, WIDTH//2, 45), (100, 50, 50))
         
         elif self.state == 'ONLINE':
             # 联机游戏界面
-            self.ui.draw_board(self.logic, self.selected_sq, 'PLAYING', 0, [], False)
+            with self.profiler.stage("draw_board"):
+                self.ui.draw_board(self.logic, self.selected_sq, 'PLAYING', 0, [], False)
             self.ui.draw_panel(self.logic, 'PLAYING', "", 0, [])
             # 绘制时钟面板
             if self.time_enabled:
-                self.ui.draw_clock_panel(self.white_time, self.black_time, self.logic.board.turn, self.logic.player_color)
+                with self.profiler.stage("draw_clock_panel"):
+                    self.ui.draw_clock_panel(self.white_time, self.black_time, self.logic.board.turn, self.logic.player_color)
             # 超时显示
             if self.time_expired:
                 loser = "白方" if self.white_time <= 0 else "黑方"
                 winner = "黑方" if self.white_time <= 0 else "白方"
-                timeout_txt = self.ui.font.render(f"{loser}超时 - {winner}胜!", True, (255, 80, 80))
+                timeout_txt = self.ui.render_text(self.ui.font, f"{loser}超时 - {winner}胜!", (255, 80, 80))
                 self.screen.blit(timeout_txt, (BOARD_SIZE//2 - timeout_txt.get_width()//2, BOARD_HEIGHT//2 - 20))
             # 显示对战信息
             info = f"Lichess | 你执{'白' if self.logic.player_color == chess.WHITE else '黑'}"
-            self.screen.blit(self.ui.small_font.render(info, True, (150, 200, 255)), (20, BOARD_HEIGHT + 45))
+            self.screen.blit(self.ui.render_text(self.ui.small_font, info, (150, 200, 255)), (20, BOARD_HEIGHT + 45))
+            if self.online_notice:
+                self.screen.blit(self.ui.render_text(self.ui.small_font, self.online_notice, (255, 150, 150)), (20, BOARD_HEIGHT + 75))
             self.ui.draw_button("认输退出", pygame.Rect(WIDTH - 240, BOARD_HEIGHT + 70, 220, 40), (120, 40, 40))
         
         elif self.state == 'OPENING_MENU':
             # 标题
-            title_txt = self.ui.font.render("开局百科", True, (255, 255, 255))
+            title_txt = self.ui.render_text(self.ui.font, "开局百科", (255, 255, 255))
             self.screen.blit(title_txt, (WIDTH//2 - title_txt.get_width()//2, 30))
             
             # 创建滚动区域的裁剪表面
@@ -559,6 +778,7 @@ class ChessApp:
                 # 滚动条滑块（拖拽时高亮）
                 mouse_pos = pygame.mouse.get_pos()
                 scrollbar_rect = pygame.Rect(WIDTH - 14, scrollbar_y, 12, scrollbar_height)
+                self.ui.hover_rects.append(scrollbar_rect)
                 if self.dragging_scrollbar:
                     bar_color = (200, 180, 80)  # 拖拽时金黄色
                 elif scrollbar_rect.collidepoint(mouse_pos):
@@ -572,7 +792,7 @@ class ChessApp:
             self.ui.draw_button("★ 外部谱自由探索", pygame.Rect(WIDTH//4, HEIGHT - 140, WIDTH//2, 50), (45, 90, 45))
             self.ui.draw_button("返回主菜单", pygame.Rect(WIDTH//4, HEIGHT-70, WIDTH//2, 45), (100, 50, 50))
         elif self.state == 'TIME_SELECT':
-            title = self.ui.font.render("选择时间限制", True, (255, 255, 255))
+            title = self.ui.render_text(self.ui.font, "选择时间限制", (255, 255, 255))
             self.screen.blit(title, (WIDTH//2 - title.get_width()//2, 120))
             btn_y = 200
             for label, minutes, inc in TIME_CONTROLS:
@@ -582,30 +802,101 @@ class ChessApp:
         elif self.state == 'SELECT_SIDE':
             self.ui.draw_button("执白", pygame.Rect(WIDTH//4, 250, WIDTH//2, 60), (220, 220, 220), (0,0,0))
             self.ui.draw_button("执黑", pygame.Rect(WIDTH//4, 330, WIDTH//2, 60), (40, 40, 40))
+            level_name = DIFFICULTY_LEVELS[self.logic.difficulty][0]
+            self.ui.draw_button(f"难度: {level_name}", pygame.Rect(WIDTH//4, 410, WIDTH//2, 50), (70, 70, 70))
+            bench_label = "测试中..." if self.logic.benching else "引擎速度测试"
+            self.ui.draw_button(bench_label, pygame.Rect(WIDTH//4, 480, WIDTH//2, 50), (45, 70, 90))
+            if self.logic.bench_status:
+                hint = self.ui.render_text(self.ui.small_font, self.logic.bench_status, (180, 180, 180))
+                self.screen.blit(hint, (WIDTH//2 - hint.get_width()//2, 550))
         elif self.state in ['PLAYING', 'LEARNING', 'PROMOTING']:
             hints = (self.state == 'LEARNING')
-            self.ui.draw_board(self.logic, self.selected_sq, self.state, self.learning_data["step"], self.learning_data["seq"], hints)
+            tb_hint = self.logic.get_tablebase_hint() if self.show_tablebase else None
+            with self.profiler.stage("draw_board"):
+                self.ui.draw_board(self.logic, self.selected_sq, self.state, self.learning_data["step"], self.learning_data["seq"], hints, tb_hint)
             if self.state == 'PROMOTING': self.ui.draw_promotion_menu(self.logic.board.turn)
             self.ui.draw_panel(self.logic, self.state, self.learning_data["title"], self.learning_data["step"], self.learning_data["seq"])
             # 绘制时钟面板
             if self.time_enabled:
-                self.ui.draw_clock_panel(self.white_time, self.black_time, self.logic.board.turn, self.logic.player_color)
+                with self.profiler.stage("draw_clock_panel"):
+                    self.ui.draw_clock_panel(self.white_time, self.black_time, self.logic.board.turn, self.logic.player_color)
+            # 实时分析面板
+            if self.logic.analysis:
+                self.ui.draw_analysis_panel(self.logic.analysis.snapshot, self.time_enabled)
+            # 复盘面板（占用整个右侧面板）
+            if self.logic.review:
+                self.ui.draw_review_panel(self.logic.review)
             # 超时显示
             if self.time_expired:
                 loser = "白方" if self.white_time <= 0 else "黑方"
                 winner = "黑方" if self.white_time <= 0 else "白方"
-                timeout_txt = self.ui.font.render(f"{loser}超时 - {winner}胜!", True, (255, 80, 80))
+                timeout_txt = self.ui.render_text(self.ui.font, f"{loser}超时 - {winner}胜!", (255, 80, 80))
                 self.screen.blit(timeout_txt, (BOARD_SIZE//2 - timeout_txt.get_width()//2, BOARD_HEIGHT//2 - 20))
+            elif self.adjudicated:
+                adj_txt = self.ui.render_text(self.ui.font, f"残局库判定 {self.adjudicated}", (80, 160, 255))
+                self.screen.blit(adj_txt, (BOARD_SIZE//2 - adj_txt.get_width()//2, BOARD_HEIGHT//2 - 20))
+            if self._game_finished():
+                label = "复盘中..." if self.logic.review and not self.logic.review.finished else "复盘分析"
+                self.ui.draw_button(label, pygame.Rect(WIDTH - 240, BOARD_HEIGHT + 20, 220, 40), (45, 70, 90))
             self.ui.draw_button("返回主菜单 [ESC]", pygame.Rect(WIDTH - 240, BOARD_HEIGHT + 70, 220, 40), (120, 40, 40))
-        pygame.display.flip()
+        if self.profiler.overlay:
+            self.ui.draw_profiler_overlay(self.profiler.summary())
 
     def quit(self):
-        self.logic.stop_engine(); pygame.quit(); sys.exit()
+        self.logic.shutdown_engines(); pygame.quit(); sys.exit()
+
+    def _wake(self):
+        """后台线程调用：唤醒正在等待事件的主循环"""
+        try:
+            pygame.event.post(pygame.event.Event(WAKE_EVENT))
+        except pygame.error:
+            pass  # 程序正在退出
+
+    def _animating(self):
+        """是否有需要逐帧刷新的动画或拖拽"""
+        return self.dragging_scrollbar
+
+    def _next_timeout(self):
+        """距离下一次必须刷新界面的毫秒数（时钟跳秒、AI 延迟、光标闪烁等）"""
+        now = pygame.time.get_ticks()
+        timeout = IDLE_MAX_WAIT_MS
+        board = self.logic.board
+        if (self.state in ('PLAYING', 'ONLINE') and self.time_enabled and self.last_tick and not self.time_expired
+                and not self.adjudicated and not board.is_game_over()):
+            remaining = self.white_time if board.turn == chess.WHITE else self.black_time
+            remaining -= (now - self.last_tick) / 1000.0
+            timeout = min(timeout, int((remaining - math.floor(remaining)) * 1000) + 1)  # 显示的秒数下一次变化
+        if self.state == 'PLAYING' and self.ai_timer > 0:
+            ai_delay = 0 if self.time_enabled else 1000
+            timeout = min(timeout, self.ai_timer + ai_delay - now)
+        if self.input_active:
+            timeout = min(timeout, 500 - now % 500)  # 光标闪烁
+        if self.state == 'CHALLENGES':
+            timeout = min(timeout, 2000 - now % 2000)
+        if self.state == 'ONLINE' and self.online_pending_deadline is not None:
+            timeout = min(timeout, self.online_pending_deadline - now)
+        if self.profiler.overlay:
+            timeout = min(timeout, 500)
+        return max(1, timeout)
 
     def run(self):
         clock = pygame.time.Clock()
         while True:
-            self.handle_events(); self.update(); self.draw(); clock.tick(60)
+            if self._animating():
+                clock.tick(MAX_FPS)
+                events = pygame.event.get()
+            else:
+                # 空闲时睡眠，直到有输入、后台事件或下一次定时刷新
+                event = pygame.event.wait(self._next_timeout())
+                events = [e for e in (event, *pygame.event.get()) if e.type != pygame.NOEVENT]
+            self.profiler.begin_frame()
+            with self.profiler.stage("events"):
+                self.handle_events(events)
+            with self.profiler.stage("update"):
+                self.update()
+            with self.profiler.stage("draw"):
+                self.draw()
+            self.profiler.end_frame()
 
 if __name__ == "__main__":
     if os.path.exists("images"): ChessApp().run()
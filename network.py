@@ -8,15 +8,22 @@ import queue
 import time
 import json
 import requests
+from constants import LICHESS_POOL_SIZE, LICHESS_RETRIES, LICHESS_RETRY_BACKOFF
 
 # 标记是否可用（检查 requests）
 try:
     import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
     BERSERK_AVAILABLE = True  # 保持变量名兼容
 except ImportError:
     BERSERK_AVAILABLE = False
     print("请安装 requests: pip install requests")
 
+# 对局结束的 gameState 状态（不会被后续快照合并掉）
+GAME_OVER_STATUSES = frozenset(['mate', 'resign', 'stalemate', 'timeout', 'draw', 'outoftime',
+                                'aborted', 'noStart', 'cheat', 'variantEnd'])
+
 class LichessClient:
     def __init__(self):
         self.token = None
@@ -31,7 +38,31 @@ class LichessClient:
         self.matching = False
         self.match_result = None  # (success, message)
         self.match_thread = None
-        
+        self.on_event = None  # 收到对局事件或匹配结束时在后台线程中调用
+        # 走法由后台线程按顺序发送，界面线程不等待网络
+        self.send_queue = queue.Queue()
+        self.sender_thread = None
+        # 界面线程中的请求和发送走法共用一个连接池（keep-alive 复用 TLS 连接），失败时不重试，避免界面长时间卡住；
+        # 后台线程中的事件流和对局流另用一个会话，连接失败或服务器 5xx 时退避重试
+        self.session = self._create_session(LICHESS_POOL_SIZE, 0) if BERSERK_AVAILABLE else None
+        self.stream_session = self._create_session(2, Retry(
+            total=LICHESS_RETRIES, backoff_factor=LICHESS_RETRY_BACKOFF,
+            status_forcelist=(500, 502, 503, 504), allowed_methods=frozenset(["GET"]))) if BERSERK_AVAILABLE else None
+
+    def _create_session(self, pool_size, retries):
+        # 不重试 429：Lichess 要求收到 429 后等待一分钟再请求
+        session = requests.Session()
+        session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retries))
+        return session
+
+    def _notify(self):
+        if self.on_event:
+            self.on_event()
+
+    def _push_event(self, event):
+        self.move_queue.put(event)
+        self._notify()
+
     def connect(self, token):
         """连接到 Lichess"""
         if not BERSERK_AVAILABLE:
@@ -45,7 +76,7 @@ class LichessClient:
         try:
             # 用 requests 验证 token
             headers = {"Authorization": f"Bearer {token}"}
-            resp = requests.get("https://lichess.org/api/account", headers=headers, timeout=10)
+            resp = self.session.get("https://lichess.org/api/account", headers=headers, timeout=10)
             
             if resp.status_code == 401:
                 return False, "Token无效或已过期"
@@ -55,6 +86,8 @@ class LichessClient:
             account = resp.json()
             self.username = account.get('username', 'Unknown')
             self.token = token
+            for session in (self.session, self.stream_session):
+                session.headers["Authorization"] = f"Bearer {token}"  # 之后的请求都复用会话和认证头
             self.connected = True
             return True, f"已连接: {self.username}"
         except requests.exceptions.Timeout:
@@ -80,15 +113,13 @@ class LichessClient:
         
         def do_match():
             try:
-                headers = {"Authorization": f"Bearer {self.token}"}
                 game_found = threading.Event()
                 
                 def wait_for_game():
                     try:
                         # 使用 requests 流式获取事件
-                        event_resp = requests.get(
+                        event_resp = self.stream_session.get(
                             "https://lichess.org/api/stream/event",
-                            headers=headers,
                             stream=True,
                             timeout=70
                         )
@@ -120,9 +151,8 @@ class LichessClient:
                     "time": time_limit,
                     "increment": increment
                 }
-                seek_resp = requests.post(
+                seek_resp = self.session.post(
                     "https://lichess.org/api/board/seek",
-                    headers=headers,
                     data=data,
                     timeout=65
                 )
@@ -138,6 +168,7 @@ class LichessClient:
                 self.match_result = (False, f"匹配失败: {str(e)[:30]}")
             finally:
                 self.matching = False
+                self._notify()
         
         self.match_thread = threading.Thread(target=do_match, daemon=True)
         self.match_thread.start()
@@ -161,15 +192,13 @@ class LichessClient:
         
         try:
             # 使用 requests 发送挑战
-            headers = {"Authorization": f"Bearer {self.token}"}
             data = {
                 "rated": "false",
                 "clock.limit": time_limit * 60,
                 "clock.increment": increment
             }
-            resp = requests.post(
+            resp = self.session.post(
                 f"https://lichess.org/api/challenge/{opponent_username}",
-                headers=headers,
                 data=data,
                 timeout=10
             )
@@ -188,9 +217,8 @@ class LichessClient:
             
             def wait_for_accept():
                 try:
-                    event_resp = requests.get(
+                    event_resp = self.stream_session.get(
                         "https://lichess.org/api/stream/event",
-                        headers=headers,
                         stream=True,
                         timeout=60
                     )
@@ -233,10 +261,8 @@ class LichessClient:
         
         try:
             # 用 requests 接受挑战
-            headers = {"Authorization": f"Bearer {self.token}"}
-            resp = requests.post(
+            resp = self.session.post(
                 f"https://lichess.org/api/challenge/{challenge_id}/accept",
-                headers=headers,
                 timeout=10
             )
             
@@ -249,9 +275,8 @@ class LichessClient:
             
             # 判断颜色（需要从游戏状态获取）
             if self.game_id:
-                game_resp = requests.get(
+                game_resp = self.session.get(
                     f"https://lichess.org/api/board/game/stream/{self.game_id}",
-                    headers=headers,
                     stream=True,
                     timeout=10
                 )
@@ -280,10 +305,8 @@ class LichessClient:
             return []
         
         try:
-            headers = {"Authorization": f"Bearer {self.token}"}
-            resp = requests.get(
+            resp = self.session.get(
                 "https://lichess.org/api/challenge",
-                headers=headers,
                 timeout=10
             )
             if resp.status_code == 200:
@@ -298,10 +321,8 @@ class LichessClient:
         """开始监听游戏状态流"""
         def stream_game():
             try:
-                headers = {"Authorization": f"Bearer {self.token}"}
-                resp = requests.get(
+                resp = self.stream_session.get(
                     f"https://lichess.org/api/board/game/stream/{self.game_id}",
-                    headers=headers,
                     stream=True,
                     timeout=None  # 长连接不设超时
                 )
@@ -313,18 +334,18 @@ class LichessClient:
                                 # 游戏完整状态
                                 state = event.get('state', {})
                                 moves = state.get('moves', '')
-                                self.move_queue.put(('full', moves))
+                                self._push_event(('full', moves))
                             elif event.get('type') == 'gameState':
                                 # 游戏状态更新
                                 moves = event.get('moves', '')
                                 status = event.get('status', '')
-                                self.move_queue.put(('state', moves, status))
+                                self._push_event(('state', moves, status))
                             elif event.get('type') == 'chatLine':
                                 pass  # 忽略聊天
                         except json.JSONDecodeError:
                             pass
             except Exception as e:
-                self.move_queue.put(('error', str(e)))
+                self._push_event(('error', str(e)))
         
         self.stream_thread = threading.Thread(target=stream_game, daemon=True)
         self.stream_thread.start()
@@ -333,20 +354,56 @@ class LichessClient:
         """发送走法到 Lichess"""
         if not self.game_id or not self.token:
             return False
-        
+        return self._post_move(self.game_id, uci_move) == 200
+
+    def _post_move(self, game_id, uci_move):
+        """发送走法，返回 HTTP 状态码；网络错误或超时（服务器可能已收到）时返回 None"""
         try:
             # 直接用 requests 发送走法，避免 ndjson 兼容性问题
-            headers = {"Authorization": f"Bearer {self.token}"}
-            resp = requests.post(
-                f"https://lichess.org/api/board/game/{self.game_id}/move/{uci_move}",
-                headers=headers,
+            resp = self.session.post(
+                f"https://lichess.org/api/board/game/{game_id}/move/{uci_move}",
                 timeout=10
             )
-            return resp.status_code == 200
+            return resp.status_code
         except Exception as e:
             print(f"发送走法失败: {e}")
-            return False
+            return None
     
+    def send_move(self, uci_move):
+        """把走法放入发送队列后立即返回，结果通过 move_queue 通知：
+        ('rejected', 走法)：服务器拒绝（4xx）；
+        ('unconfirmed', 走法)：网络错误、超时或 5xx，正在退避重发；
+        ('ambiguous', 走法)：重发时被拒绝，可能是之前的请求已经生效，由之后的对局状态确认；
+        ('failed', 走法)：重发 LICHESS_RETRIES 次后仍然失败"""
+        if not self.game_id or not self.token:
+            return False
+        self.send_queue.put((self.game_id, uci_move))
+        if self.sender_thread is None or not self.sender_thread.is_alive():
+            self.sender_thread = threading.Thread(target=self._send_moves, daemon=True)
+            self.sender_thread.start()
+        return True
+
+    def _send_moves(self):
+        while True:
+            game_id, uci_move = self.send_queue.get()
+            if game_id != self.game_id:
+                continue  # 对局已结束或已切换，丢弃旧走法
+            for attempt in range(LICHESS_RETRIES + 1):
+                if attempt:
+                    time.sleep(LICHESS_RETRY_BACKOFF * 2 ** attempt)
+                    if game_id != self.game_id:
+                        break
+                status = self._post_move(game_id, uci_move)
+                if status == 200:
+                    break
+                if status is not None and 400 <= status < 500:
+                    self._push_event(('ambiguous' if attempt else 'rejected', uci_move))
+                    break
+                if not attempt:
+                    self._push_event(('unconfirmed', uci_move))
+            else:
+                self._push_event(('failed', uci_move))
+
     def get_opponent_move(self):
         """获取对手的走法（非阻塞）"""
         try:
@@ -354,14 +411,27 @@ class LichessClient:
         except queue.Empty:
             return None
     
+    def drain_events(self):
+        """取出队列中的全部事件（非阻塞）。连续的 'full' / 'state' 快照只保留最新的一个，
+        错误、拒绝走法和对局结束的快照原样保留"""
+        events = []
+        while True:
+            try:
+                event = self.move_queue.get_nowait()
+            except queue.Empty:
+                return events
+            if (event[0] in ('full', 'state') and events and events[-1][0] in ('full', 'state')
+                    and not (len(events[-1]) > 2 and events[-1][2] in GAME_OVER_STATUSES)):
+                events[-1] = event  # 快照包含完整走法列表，旧的可以直接丢弃
+            else:
+                events.append(event)
+
     def resign(self):
         """认输"""
         if self.game_id and self.token:
             try:
-                headers = {"Authorization": f"Bearer {self.token}"}
-                requests.post(
+                self.session.post(
                     f"https://lichess.org/api/board/game/{self.game_id}/resign",
-                    headers=headers,
                     timeout=10
                 )
             except:
@@ -374,3 +444,6 @@ class LichessClient:
         self.my_color = None
         self.connected = False
         self.token = None
+        for session in (self.session, self.stream_session):
+            if session is not None:
+                session.headers.pop("Authorization", None)
@@ -0,0 +1,121 @@
+"""
+帧耗时分析模块
+按阶段（事件处理、更新、绘制及其子步骤）记录每帧耗时到环形缓冲区，
+可以显示 FPS / p50 / p99 叠加层，也可以把连续 N 帧的 cProfile 结果保存到磁盘
+"""
+
+import time
+import cProfile
+import functools
+import threading
+from collections import deque, defaultdict
+from contextlib import contextmanager
+
+
+def percentile(values, p):
+    """values 的第 p 百分位（0-100），空序列返回 0"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+class FrameProfiler:
+    def __init__(self, history=300):
+        self.history = history
+        self.frames = deque(maxlen=history)  # 每帧总耗时（毫秒）
+        self.frame_starts = deque(maxlen=history)  # 每帧开始时间，用于计算 FPS
+        self.stages = defaultdict(lambda: deque(maxlen=self.history))  # 阶段名 -> 每帧耗时（毫秒）
+        self.current = {}  # 当前帧内各阶段累计耗时
+        self.frame_start = None
+        self.overlay = False  # 是否显示叠加层
+        self.capture = None  # 正在进行的 cProfile
+        self.capture_left = 0
+        self.capture_path = None
+
+    def begin_frame(self):
+        self.frame_start = time.perf_counter()
+        self.frame_starts.append(self.frame_start)
+        self.current = {}
+        if self.capture is not None:
+            self.capture.enable()
+
+    def end_frame(self):
+        if self.frame_start is None:
+            return
+        if self.capture is not None:
+            self.capture.disable()
+            self.capture_left -= 1
+            if self.capture_left <= 0:
+                self._finish_capture()
+        self.frames.append((time.perf_counter() - self.frame_start) * 1000)
+        for name, elapsed in self.current.items():
+            self.stages[name].append(elapsed)
+        self.frame_start = None
+
+    @contextmanager
+    def stage(self, name):
+        """记录一个阶段的耗时（同一帧内多次进入时累加）"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._record(name, start)
+
+    def _record(self, name, start):
+        self.current[name] = self.current.get(name, 0.0) + (time.perf_counter() - start) * 1000
+
+    def instrument(self, obj, prefix, method_names):
+        """把 obj 的方法替换为计时版本（只统计主线程中的调用），用于找出阻塞界面的网络 / 引擎调用"""
+        main_thread = threading.main_thread()
+        for name in method_names:
+            method = getattr(obj, name)
+
+            @functools.wraps(method)
+            def timed(*args, _method=method, _name=f"{prefix}.{name}", **kwargs):
+                if threading.current_thread() is not main_thread or self.frame_start is None:
+                    return _method(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return _method(*args, **kwargs)
+                finally:
+                    self._record(_name, start)
+
+            setattr(obj, name, timed)
+
+    def start_capture(self, frames, path):
+        """对接下来的 frames 帧运行 cProfile，结束后保存为 pstats 文件"""
+        if self.capture is not None:
+            return
+        self.capture = cProfile.Profile()
+        self.capture_left = frames
+        self.capture_path = path
+        print(f"开始性能采样: {frames} 帧")
+
+    def _finish_capture(self):
+        profile, self.capture = self.capture, None
+        try:
+            profile.dump_stats(self.capture_path)
+            print(f"性能采样已保存: {self.capture_path}")
+        except OSError as e:
+            print(f"保存性能采样失败: {e}")
+
+    def fps(self):
+        """最近一秒内的帧数"""
+        if not self.frame_starts:
+            return 0
+        now = time.perf_counter()
+        return sum(1 for t in self.frame_starts if now - t <= 1.0)
+
+    def summary(self):
+        """叠加层显示的统计：FPS、帧耗时 p50/p99 以及按 p99 排序的各阶段 (名称, p50, p99)"""
+        frames = list(self.frames)
+        stages = [(name, percentile(list(values), 50), percentile(list(values), 99))
+                  for name, values in self.stages.items()]
+        stages.sort(key=lambda s: s[2], reverse=True)
+        return {
+            "fps": self.fps(),
+            "p50": percentile(frames, 50),
+            "p99": percentile(frames, 99),
+            "stages": stages,
+        }
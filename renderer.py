@@ -1,6 +1,8 @@
+import os
 import pygame
 import chess
 import math
+from collections import OrderedDict
 from constants import *
 
 class Renderer:
@@ -8,16 +10,111 @@ class Renderer:
         self.screen = screen
         self.font = pygame.font.SysFont("SimHei", 40)
         self.small_font = pygame.font.SysFont("SimHei", 24)
-        self.images = self._load_images()
+        self.tiny_font = pygame.font.SysFont("SimHei", 16)
+        # 时钟面板字体（SysFont 需要搜索系统字体列表，只创建一次）
+        self.clock_font = pygame.font.SysFont("Consolas", 36, bold=True)
+        self.label_font = pygame.font.SysFont("SimHei", 18)
+        self.clock_glyphs = {ch: self.clock_font.render(ch, True, (255, 255, 255)) for ch in "0123456789:-"}
+        self.text_cache = OrderedDict()  # (字体, 文字, 颜色) -> Surface；时钟读数的颜色为 None，值为 (Surface, 宽度)
+        self.atlas = None
+        self.sprites = {}  # 格子尺寸 -> {棋子符号: 图集子表面}
+        self._load_images()
+        self.images = self.piece_images(SQ_SIZE)
+        # 局部重绘用：本帧绘制的可悬停区域（屏幕坐标）、时钟和分析面板所在区域
+        self.hover_rects = []
+        self.clock_rects = []
+        self.analysis_rect = None
+        self.profiler_rect = pygame.Rect(4, 4, 260, 26 + 4 * 18)
+        # 棋盘图层缓存：底色只画一次，棋子层在局面或视角变化时重建，高亮色块预先分配
+        self.board_background = None
+        self.piece_layer = pygame.Surface((BOARD_SIZE, BOARD_HEIGHT), pygame.SRCALPHA)
+        self.piece_layer_key = None
+        self.highlights = {}
 
     def _load_images(self):
-        imgs = {}
-        pieces = ['P', 'R', 'N', 'B', 'Q', 'K']
-        for p in pieces:
-            imgs[p] = pygame.transform.scale(pygame.image.load(f"images/w{p}.png"), (SQ_SIZE, SQ_SIZE))
-            imgs[p.lower()] = pygame.transform.scale(pygame.image.load(f"images/b{p}.png"), (SQ_SIZE, SQ_SIZE))
-        return imgs
+        """把 12 个棋子按 PIECE_SPRITE_SIZES 的每种尺寸各缩放一次，拼成一张显示格式的图集
+        每种尺寸占一行；图集缓存在 SPRITE_ATLAS_PATH，棋子图片更新后重新生成"""
+        symbols = ['P', 'R', 'N', 'B', 'Q', 'K', 'p', 'r', 'n', 'b', 'q', 'k']
+        files = [f"images/{'w' if s.isupper() else 'b'}{s.upper()}.png" for s in symbols]
+        sizes = sorted(set(PIECE_SPRITE_SIZES) | {SQ_SIZE})
+        atlas_size = (len(symbols) * sizes[-1], sum(sizes))
+
+        atlas = None
+        if os.path.exists(SPRITE_ATLAS_PATH):
+            mtime = os.path.getmtime(SPRITE_ATLAS_PATH)
+            if all(os.path.getmtime(f) <= mtime for f in files):
+                try:
+                    atlas = pygame.image.load(SPRITE_ATLAS_PATH)
+                except pygame.error:
+                    atlas = None
+                if atlas is not None and atlas.get_size() != atlas_size:
+                    atlas = None  # 尺寸配置已变化
+        if atlas is None:
+            atlas = pygame.Surface(atlas_size, pygame.SRCALPHA)
+            sources = [pygame.image.load(f) for f in files]
+            y = 0
+            for size in sizes:
+                for i, img in enumerate(sources):
+                    atlas.blit(pygame.transform.scale(img, (size, size)), (i * size, y))
+                y += size
+            try:
+                pygame.image.save(atlas, SPRITE_ATLAS_PATH)
+            except pygame.error as e:
+                print(f"保存棋子图集失败: {e}")
+        self.atlas = atlas.convert_alpha()
+
+        y = 0
+        for size in sizes:
+            self.sprites[size] = {s: self.atlas.subsurface((i * size, y, size, size)) for i, s in enumerate(symbols)}
+            y += size
+
+    def piece_images(self, size):
+        """指定格子尺寸的棋子图片；不在预设尺寸中时从最大尺寸缩放一次并缓存"""
+        if size not in self.sprites:
+            largest = self.sprites[max(self.sprites)]
+            self.sprites[size] = {s: pygame.transform.smoothscale(img, (size, size)).convert_alpha()
+                                  for s, img in largest.items()}
+        return self.sprites[size]
     
+    def render_text(self, font, text, color):
+        """渲染文字（抗锯齿），结果按 (字体, 文字, 颜色) 缓存"""
+        key = (font, text, color)
+        surface = self.text_cache.get(key)
+        if surface is not None:
+            self.text_cache.move_to_end(key)
+            return surface
+        surface = font.render(text, True, color)
+        self.text_cache[key] = surface
+        if len(self.text_cache) > TEXT_CACHE_SIZE:
+            self.text_cache.popitem(last=False)
+        return surface
+
+    def _clock_surface(self, text):
+        """用预渲染的数字字形拼出时钟读数，返回 (Surface, 排版宽度)；结果缓存，每个读数只排版一次"""
+        key = (self.clock_font, text, None)
+        cached = self.text_cache.get(key)
+        if cached is not None:
+            self.text_cache.move_to_end(key)
+            return cached
+        # 按整串排版的前缀宽度定位，与整串渲染的字距一致
+        offsets = [self.clock_font.size(text[:i])[0] for i in range(len(text))]
+        glyphs = [self.clock_glyphs[ch] for ch in text]
+        width = max(x + g.get_width() for x, g in zip(offsets, glyphs))
+        surface = pygame.Surface((width, max(g.get_height() for g in glyphs)), pygame.SRCALPHA)
+        # 底色为透明的白色：白色字形逐个叠加后，一次绘制到屏幕与逐个字形绘制的结果相同
+        surface.fill((255, 255, 255, 0))
+        for x, glyph in zip(offsets, glyphs):
+            surface.blit(glyph, (x, 0))
+        cached = (surface, self.clock_font.size(text)[0])
+        self.text_cache[key] = cached
+        if len(self.text_cache) > TEXT_CACHE_SIZE:
+            self.text_cache.popitem(last=False)
+        return cached
+
+    def _draw_clock_digits(self, text, center_x, y):
+        surface, width = self._clock_surface(text)
+        self.screen.blit(surface, (center_x - width // 2, y))
+
     def draw_menu_background(self):
         """绘制主菜单背景"""
         self.screen.fill(BG_COLOR)
@@ -27,6 +124,7 @@ class Renderer:
         mouse_pressed = pygame.mouse.get_pressed()[0]
         is_hovered = rect.collidepoint(mouse_pos)
         is_pressed = is_hovered and mouse_pressed
+        self.hover_rects.append(rect)
         
         # 根据状态调整颜色
         if is_pressed:
@@ -52,7 +150,7 @@ class Renderer:
         # 绘制边框
         pygame.draw.rect(self.screen, border_color, rect, 2, border_radius=5)
         # 绘制文字
-        txt = self.small_font.render(text, True, text_color)
+        txt = self.render_text(self.small_font, text, text_color)
         text_offset = 1 if is_pressed else 0
         self.screen.blit(txt, (rect.centerx - txt.get_width() // 2 + text_offset, 
                                rect.centery - txt.get_height() // 2 + text_offset))
@@ -66,6 +164,7 @@ class Renderer:
         mouse_pressed = pygame.mouse.get_pressed()[0]
         is_hovered = rect.collidepoint(adjusted_mouse)
         is_pressed = is_hovered and mouse_pressed
+        self.hover_rects.append(rect.move(0, 80))
         
         if is_pressed:
             adjusted_color = tuple(max(0, c - 40) for c in color)
@@ -83,7 +182,7 @@ class Renderer:
         pygame.draw.rect(surface, (20, 20, 20), rect.move(shadow_offset, shadow_offset), border_radius=5)
         pygame.draw.rect(surface, adjusted_color, rect, border_radius=5)
         pygame.draw.rect(surface, border_color, rect, 2, border_radius=5)
-        txt = self.small_font.render(text, True, text_color)
+        txt = self.render_text(self.small_font, text, text_color)
         text_offset = 1 if is_pressed else 0
         surface.blit(txt, (rect.centerx - txt.get_width() // 2 + text_offset, 
                            rect.centery - txt.get_height() // 2 + text_offset))
@@ -118,11 +217,41 @@ class Renderer:
         # 绘制三角形箭头
         pygame.draw.polygon(self.screen, color, [point1, point2, point3])
 
-    def draw_board(self, logic, selected_sq, state, learning_step, learning_seq, show_hints=False):
+    def _board_background(self):
+        """棋盘底色（两种视角下格子颜色相同，只需画一次）"""
+        if self.board_background is None:
+            surface = pygame.Surface((BOARD_SIZE, BOARD_HEIGHT)).convert()
+            for r in range(8):
+                for c in range(8):
+                    pygame.draw.rect(surface, COLORS[(r + c) % 2], (c * SQ_SIZE, r * SQ_SIZE, SQ_SIZE, SQ_SIZE))
+            self.board_background = surface
+        return self.board_background
+
+    def _piece_layer_for(self, logic):
+        """透明背景的棋子层，只在棋子位置或视角变化时重建"""
+        board = logic.board
+        key = (board.pawns, board.knights, board.bishops, board.rooks, board.queens, board.kings,
+               board.occupied_co[chess.WHITE], logic.player_color)
+        if key != self.piece_layer_key:
+            self.piece_layer.fill((0, 0, 0, 0))
+            for sq, p in board.piece_map().items():
+                c, r = logic.get_coords_from_sq(sq)
+                self.piece_layer.blit(self.images[p.symbol()], (c * SQ_SIZE, r * SQ_SIZE))
+            self.piece_layer_key = key
+        return self.piece_layer
+
+    def _highlight(self, color):
+        """预先分配的半透明高亮色块，按颜色复用"""
+        surface = self.highlights.get(color)
+        if surface is None:
+            surface = pygame.Surface((SQ_SIZE, SQ_SIZE), pygame.SRCALPHA)
+            surface.fill(color)
+            self.highlights[color] = surface
+        return surface
+
+    def draw_board(self, logic, selected_sq, state, learning_step, learning_seq, show_hints=False, tablebase_hint=None):
         # 1. 绘制基础棋盘格
-        for r in range(8):
-            for c in range(8):
-                pygame.draw.rect(self.screen, COLORS[(r + c) % 2], (c * SQ_SIZE, r * SQ_SIZE, SQ_SIZE, SQ_SIZE))
+        self.screen.blit(self._board_background(), (0, 0))
         
                 # --- 核心修改：绘制开局书提示箭头 ---
         if show_hints:
@@ -138,26 +267,30 @@ class Renderer:
                 self._draw_arrow((34, 177, 76), start_coords, end_coords)
 
 
+        # 残局库提示：最佳走法箭头 + 胜负信息
+        if tablebase_hint:
+            tb_move, wdl, dtz = tablebase_hint
+            if tb_move:
+                self._draw_arrow((40, 120, 220), logic.get_coords_from_sq(tb_move.from_square),
+                                 logic.get_coords_from_sq(tb_move.to_square))
+            verdict = "必胜" if wdl == 2 else "必败" if wdl == -2 else "和棋"
+            label = self.render_text(self.small_font, f"残局库: {verdict} DTZ {abs(dtz)}", (40, 120, 220))
+            self.screen.blit(label, (8, 8))
+
         # 3. 绘制百科固定线路高亮
         if state == 'LEARNING' and learning_seq and learning_step < len(learning_seq):
             mv = chess.Move.from_uci(learning_seq[learning_step])
             for sq, color in [(mv.from_square, (0, 255, 255, 120)), (mv.to_square, (0, 255, 0, 150))]:
                 c, r = logic.get_coords_from_sq(sq)
-                s = pygame.Surface((SQ_SIZE, SQ_SIZE), pygame.SRCALPHA); s.fill(color)
-                self.screen.blit(s, (c * SQ_SIZE, r * SQ_SIZE))
+                self.screen.blit(self._highlight(color), (c * SQ_SIZE, r * SQ_SIZE))
 
         # 4. 绘制玩家选中高亮
         if selected_sq is not None:
             c, r = logic.get_coords_from_sq(selected_sq)
-            s = pygame.Surface((SQ_SIZE, SQ_SIZE), pygame.SRCALPHA); s.fill((255, 255, 0, 150))
-            self.screen.blit(s, (c * SQ_SIZE, r * SQ_SIZE))
+            self.screen.blit(self._highlight((255, 255, 0, 150)), (c * SQ_SIZE, r * SQ_SIZE))
 
         # 5. 【核心修复】绘制所有棋子 (必须在格子和提示的上方)
-        for sq in chess.SQUARES:
-            p = logic.board.piece_at(sq)
-            if p:
-                c, r = logic.get_coords_from_sq(sq)
-                self.screen.blit(self.images[p.symbol()], (c * SQ_SIZE, r * SQ_SIZE))
+        self.screen.blit(self._piece_layer_for(logic), (0, 0))
 
     def draw_panel(self, logic, state, learning_title, learning_step, learning_seq):
         pygame.draw.rect(self.screen, PANEL_COLOR, (0, BOARD_HEIGHT, WIDTH, HEIGHT - BOARD_HEIGHT))
@@ -176,12 +309,17 @@ class Renderer:
             txt = f"等待{turn}走棋..."; col = (255, 255, 255)
         
         # 第一行：状态信息
-        self.screen.blit(self.small_font.render(txt, True, col), (20, BOARD_HEIGHT + 15))
+        self.screen.blit(self.render_text(self.small_font, txt, col), (20, BOARD_HEIGHT + 15))
         
         # 第二行：显示完整开局名称（如果被截断了）
         if state == 'LEARNING' and len(learning_title) > max_title_len:
-            full_txt = self.small_font.render(learning_title, True, (120, 200, 120))
+            full_txt = self.render_text(self.small_font, learning_title, (120, 200, 120))
             self.screen.blit(full_txt, (20, BOARD_HEIGHT + 50))
+        # 第二行：人机对战时显示 AI 上一步及其来源
+        elif state == 'PLAYING' and logic.last_ai_move:
+            san, source = logic.last_ai_move
+            source_name = {"book": "开局库", "tablebase": "残局库", "cache": "缓存", "engine": "引擎"}.get(source, source)
+            self.screen.blit(self.render_text(self.small_font, f"AI: {san} ({source_name})", (180, 180, 220)), (20, BOARD_HEIGHT + 50))
     
     def draw_promotion_menu(self, turn):
         # 遮罩层
@@ -220,10 +358,6 @@ class Renderer:
             secs = int(seconds) % 60
             return f"{mins:02d}:{secs:02d}"
         
-        # 时钟字体
-        clock_font = pygame.font.SysFont("Consolas", 36, bold=True)
-        label_font = pygame.font.SysFont("SimHei", 18)
-        
         # 对手时钟 (顶部)
         opponent_color = chess.BLACK if player_color == chess.WHITE else chess.WHITE
         opponent_time = black_time if opponent_color == chess.BLACK else white_time
@@ -235,10 +369,8 @@ class Renderer:
         pygame.draw.rect(self.screen, opp_bg, opp_rect, border_radius=8)
         
         opp_label = "黑方" if opponent_color == chess.BLACK else "白方"
-        self.screen.blit(label_font.render(opp_label, True, (180, 180, 180)), (panel_x + 20, 55))
-        
-        opp_time_txt = clock_font.render(format_time(opponent_time), True, (255, 255, 255))
-        self.screen.blit(opp_time_txt, (panel_x + SIDE_PANEL_WIDTH//2 - opp_time_txt.get_width()//2, 85))
+        self.screen.blit(self.render_text(self.label_font, opp_label, (180, 180, 180)), (panel_x + 20, 55))
+        self._draw_clock_digits(format_time(opponent_time), panel_x + SIDE_PANEL_WIDTH//2, 85)
         
         # 玩家时钟 (底部)
         player_time = white_time if player_color == chess.WHITE else black_time
@@ -250,11 +382,101 @@ class Renderer:
         pygame.draw.rect(self.screen, player_bg, player_rect, border_radius=8)
         
         player_label = "白方" if player_color == chess.WHITE else "黑方"
-        self.screen.blit(label_font.render(player_label + " (你)", True, (180, 180, 180)), (panel_x + 20, BOARD_HEIGHT - 145))
-        
-        player_time_txt = clock_font.render(format_time(player_time), True, (255, 255, 255))
-        self.screen.blit(player_time_txt, (panel_x + SIDE_PANEL_WIDTH//2 - player_time_txt.get_width()//2, BOARD_HEIGHT - 115))
+        self.screen.blit(self.render_text(self.label_font, player_label + " (你)", (180, 180, 180)), (panel_x + 20, BOARD_HEIGHT - 145))
+        self._draw_clock_digits(format_time(player_time), panel_x + SIDE_PANEL_WIDTH//2, BOARD_HEIGHT - 115)
+        self.clock_rects = [opp_rect, player_rect]
         
         if not time_enabled:
-            hint = label_font.render("无限时", True, (120, 120, 120))
-            self.screen.blit(hint, (panel_x + SIDE_PANEL_WIDTH//2 - hint.get_width()//2, BOARD_HEIGHT//2 - 10))
\ No newline at end of file
+            hint = self.render_text(self.label_font, "无限时", (120, 120, 120))
+            self.screen.blit(hint, (panel_x + SIDE_PANEL_WIDTH//2 - hint.get_width()//2, BOARD_HEIGHT//2 - 10))
+
+    def draw_analysis_panel(self, snapshot, clock_shown=True):
+        """在右侧面板绘制实时分析结果（时钟显示时占用两个时钟之间的区域）"""
+        panel_x = BOARD_SIZE
+        top, bottom = (160, BOARD_HEIGHT - 160) if clock_shown else (10, BOARD_HEIGHT - 10)
+        area = pygame.Rect(panel_x + 10, top, SIDE_PANEL_WIDTH - 20, bottom - top)
+        self.analysis_rect = area
+        if not clock_shown:
+            pygame.draw.rect(self.screen, (30, 30, 35), (panel_x, 0, SIDE_PANEL_WIDTH, BOARD_HEIGHT))
+        pygame.draw.rect(self.screen, (45, 45, 50), area, border_radius=8)
+
+        if not snapshot:
+            self.screen.blit(self.render_text(self.tiny_font, "分析中...", (180, 180, 180)), (area.x + 8, area.y + 8))
+            return
+        if snapshot.get("cached"):
+            header = f"深度 {snapshot['depth']}  (缓存)"
+        else:
+            header = f"深度 {snapshot['depth']}  {snapshot['nps'] // 1000} kN/s"
+        self.screen.blit(self.render_text(self.tiny_font, header, (180, 180, 180)), (area.x + 8, area.y + 8))
+
+        y = area.y + 32
+        max_w = area.width - 16
+        for score, pv in snapshot["lines"]:
+            if y + 40 > area.bottom:
+                break
+            self.screen.blit(self.render_text(self.tiny_font, score, (255, 220, 100)), (area.x + 8, y))
+            # 变化过长时从尾部截断
+            words = pv.split()
+            while self.tiny_font.size(" ".join(words))[0] > max_w and len(words) > 1:
+                words.pop()
+            self.screen.blit(self.render_text(self.tiny_font, " ".join(words), (220, 220, 220)), (area.x + 8, y + 18))
+            y += 44
+
+    def draw_review_panel(self, review):
+        """在右侧面板绘制复盘进度、评分曲线和失误统计"""
+        panel_x = BOARD_SIZE
+        pygame.draw.rect(self.screen, (30, 30, 35), (panel_x, 0, SIDE_PANEL_WIDTH, BOARD_HEIGHT))
+        pygame.draw.line(self.screen, (60, 60, 65), (panel_x, 0), (panel_x, BOARD_HEIGHT), 2)
+
+        done, total = review.progress
+        title = "复盘完成" if review.finished else f"复盘中 {done}/{total}"
+        self.screen.blit(self.render_text(self.small_font, title, (255, 255, 255)), (panel_x + 10, 12))
+
+        # 评分曲线：上方白优，下方黑优，截断在 ±eval_clip
+        graph = pygame.Rect(panel_x + 10, 50, SIDE_PANEL_WIDTH - 20, 300)
+        pygame.draw.rect(self.screen, (45, 45, 50), graph)
+        mid_y = graph.centery
+        pygame.draw.line(self.screen, (90, 90, 95), (graph.x, mid_y), (graph.right, mid_y))
+        step = graph.width / max(1, total - 1)
+        clip = review.eval_clip
+        points = []
+        for i, score in enumerate(review.evals):
+            if score is None:
+                # 尚未评估的局面：先画出已有的连续段
+                if len(points) > 1:
+                    pygame.draw.lines(self.screen, (230, 230, 230), False, points, 2)
+                points = []
+                continue
+            score = max(-clip, min(clip, score))
+            points.append((graph.x + i * step, mid_y - score / clip * (graph.height // 2 - 4)))
+        if len(points) > 1:
+            pygame.draw.lines(self.screen, (230, 230, 230), False, points, 2)
+
+        # 失误标记
+        for i, (_, _, _, label) in enumerate(review.classify()):
+            if label and review.evals[i + 1] is not None:
+                color = (230, 60, 60) if label == review.thresholds[0][0] else (240, 160, 60)
+                x = graph.x + (i + 1) * step
+                pygame.draw.line(self.screen, color, (x, graph.y), (x, graph.bottom), 1)
+
+        # 统计：每类标记的白方 / 黑方次数
+        y = graph.bottom + 20
+        self.screen.blit(self.render_text(self.tiny_font, "        白   黑", (180, 180, 180)), (panel_x + 10, y))
+        for name, (white_count, black_count) in review.summary().items():
+            y += 24
+            self.screen.blit(self.render_text(self.tiny_font, f"{name}    {white_count}    {black_count}", (220, 220, 220)),
+                             (panel_x + 10, y))
+
+    def draw_profiler_overlay(self, summary):
+        """左上角的帧耗时叠加层：FPS、帧耗时 p50/p99，以及 p99 最高的几个阶段"""
+        overlay = pygame.Surface(self.profiler_rect.size, pygame.SRCALPHA)
+        overlay.fill((0, 0, 0, 180))
+        self.screen.blit(overlay, self.profiler_rect)
+        # 数字每帧都在变，直接渲染而不进入文字缓存
+        lines = [f"FPS {summary['fps']}  p50 {summary['p50']:.1f}ms  p99 {summary['p99']:.1f}ms"]
+        lines += [f"{name}  {p50:.2f} / {p99:.2f} ms" for name, p50, p99 in summary["stages"][:4]]
+        y = self.profiler_rect.y + 4
+        for i, line in enumerate(lines):
+            color = (255, 220, 100) if i == 1 else (220, 220, 220)  # 最慢的阶段
+            self.screen.blit(self.tiny_font.render(line, True, color), (self.profiler_rect.x + 6, y))
+            y += 22 if i == 0 else 18
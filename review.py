@@ -0,0 +1,137 @@
+"""
+对局复盘模块
+把整盘棋的局面分成 N 段，交给 N 个引擎进程并行评估，
+再按每步棋的评分损失标记失准、错着和漏着
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import chess
+import chess.engine
+
+
+class GameReview:
+    def __init__(self, engine_manager, engine_path, root_board, moves, limit, workers=None, hash_mb=64,
+                 thresholds=(("漏着", 300), ("错着", 100), ("失准", 50)), eval_clip=1000, on_update=None,
+                 eval_cache=None, after=None):
+        self.engine_manager = engine_manager
+        self.after = after  # 已取消的上一次复盘：等它的工作线程结束后再开始，避免同一个引擎同时收到两个命令
+        self.eval_cache = eval_cache  # 评估缓存：复用不浅于 limit.depth 的结果，新的评估结果写回
+        self.on_update = on_update  # 每评估完一个局面以及复盘结束时调用（在后台线程中）
+        self.engine_path = engine_path
+        self.limit = limit
+        self.workers = workers or os.cpu_count() or 1
+        self.hash_mb = hash_mb
+        self.thresholds = thresholds  # (名称, 评分损失下限)，按损失从大到小排列
+        self.eval_clip = eval_clip  # 评分截断范围，大优/大劣局面中的损失不计
+        self.moves = list(moves)
+        # 第 i 个局面是走完前 i 步之后的局面
+        self.boards = [root_board.copy(stack=False)]
+        for move in self.moves:
+            board = self.boards[-1].copy(stack=False)
+            board.push(move)
+            self.boards.append(board)
+        self.evals = [None] * len(self.boards)  # 白方视角的分数（厘兵）
+        self.done_count = 0
+        self.classified = None  # 评估完成后缓存的 classify() 结果
+        self.cancelled = False
+        self.finished = False
+        self.error = None
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    @property
+    def progress(self):
+        return self.done_count, len(self.boards)
+
+    def cancel(self):
+        self.cancelled = True
+
+    def _run(self):
+        if self.after is not None:
+            self.after.thread.join()
+            self.after = None
+        workers = max(1, min(self.workers, len(self.boards)))
+        # 连续分段：同一进程评估相邻局面，置换表可以复用
+        size = (len(self.boards) + workers - 1) // workers
+        chunks = [range(i, min(i + size, len(self.boards))) for i in range(0, len(self.boards), size)]
+        try:
+            with ThreadPoolExecutor(max_workers=len(chunks)) as pool:
+                for future in [pool.submit(self._evaluate_chunk, n, chunk) for n, chunk in enumerate(chunks)]:
+                    future.result()
+        except Exception as e:
+            self.error = e
+            print(f"复盘失败: {e}")
+        finally:
+            self.finished = True
+            if self.on_update:
+                self.on_update()
+
+    def _evaluate_chunk(self, n, chunk):
+        # 每个分段使用一个单线程引擎进程（由引擎管理器保持预热）
+        handle = self.engine_manager.acquire(self.engine_path, {"Threads": 1, "Hash": self.hash_mb}, role=f"review{n}")
+        game = object()
+        try:
+            for i in chunk:
+                if self.cancelled:
+                    return
+                board = self.boards[i]
+                if board.is_checkmate():
+                    score = -100000 if board.turn == chess.WHITE else 100000
+                elif board.is_game_over():
+                    score = 0
+                elif (cached := self._cached_score(board)) is not None:
+                    score = cached
+                else:
+                    info = handle.engine.analyse(board, self.limit, game=game)
+                    score = info["score"].white().score(mate_score=100000)
+                    if self.eval_cache is not None:
+                        self.eval_cache.put(board, info)
+                with self.lock:
+                    self.evals[i] = score
+                    self.done_count += 1
+                if self.on_update:
+                    self.on_update()
+        finally:
+            self.engine_manager.release(handle)
+
+    def _cached_score(self, board):
+        """缓存中不浅于复盘深度的评分（白方视角），没有时返回 None"""
+        if self.eval_cache is None or self.limit.depth is None:
+            return None
+        entry = self.eval_cache.get(board)
+        if entry is None or entry.depth < self.limit.depth:
+            return None
+        return entry.score.white().score(mate_score=100000)
+
+    def classify(self):
+        """每一步的 (SAN, 走子方, 评分损失, 标记)，标记为 None 表示正常；未评估完的步返回损失 None"""
+        if self.classified is not None:
+            return self.classified
+        results = []
+        for i, move in enumerate(self.moves):
+            board = self.boards[i]
+            before, after = self.evals[i], self.evals[i + 1]
+            label, loss = None, None
+            if before is not None and after is not None:
+                clip = self.eval_clip
+                before, after = max(-clip, min(clip, before)), max(-clip, min(clip, after))
+                loss = (before - after) if board.turn == chess.WHITE else (after - before)
+                for name, threshold in self.thresholds:
+                    if loss >= threshold:
+                        label = name
+                        break
+            results.append((board.san(move), board.turn, loss, label))
+        if self.finished and self.error is None and not self.cancelled:
+            self.classified = results
+        return results
+
+    def summary(self):
+        """按走子方统计各类标记的次数：{标记: [白方次数, 黑方次数]}"""
+        counts = {name: [0, 0] for name, _ in self.thresholds}
+        for _, color, _, label in self.classify():
+            if label:
+                counts[label][0 if color == chess.WHITE else 1] += 1
+        return counts
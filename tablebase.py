@@ -0,0 +1,109 @@
+"""
+Syzygy 残局库模块
+目录不存在时不可用；WDL/DTZ 结果按局面 Zobrist 哈希缓存
+"""
+
+import os
+import threading
+from collections import OrderedDict
+import chess
+import chess.polyglot
+import chess.syzygy
+
+
+class SyzygyTablebase:
+    def __init__(self, path, cache_size=65536):
+        self.path = path
+        self.tablebase = None
+        self.max_pieces = 0  # 已加载残局库支持的最大棋子数
+        self.opened = False
+        self.cache = OrderedDict()  # zobrist_hash -> (wdl, dtz)
+        self.best_moves = OrderedDict()  # zobrist_hash -> 最佳走法
+        self.cache_size = cache_size
+        self.lock = threading.Lock()
+
+    def _open(self):
+        """首次使用时打开残局库目录"""
+        self.opened = True
+        if not self.path or not os.path.isdir(self.path):
+            return
+        try:
+            self.tablebase = chess.syzygy.open_tablebase(self.path)
+        except Exception as e:
+            print(f"打开残局库失败: {e}")
+            return
+        # 表名形如 KQvKR，字母数减去 'v' 即棋子数
+        names = list(self.tablebase.wdl) or list(self.tablebase.dtz)
+        self.max_pieces = max((len(name) - 1 for name in names), default=0)
+
+    def covers(self, board):
+        """局面是否可能在残局库中（只比较棋子数，不查表）"""
+        if not self.opened:
+            self._open()
+        return (self.tablebase is not None and not board.castling_rights
+                and chess.popcount(board.occupied) <= self.max_pieces)
+
+    def probe(self, board):
+        """返回 (wdl, dtz)，均以行棋方为视角；不在残局库中时返回 None"""
+        if not self.covers(board):
+            return None
+        key = chess.polyglot.zobrist_hash(board)
+        with self.lock:
+            if key in self.cache:
+                self.cache.move_to_end(key)
+                return self.cache[key]
+            wdl = self.tablebase.get_wdl(board)
+            dtz = self.tablebase.get_dtz(board) if wdl is not None else None
+            result = (wdl, dtz) if wdl is not None and dtz is not None else None
+            self._remember(self.cache, key, result)
+            return result
+
+    def _remember(self, cache, key, value):
+        cache[key] = value
+        while len(cache) > self.cache_size:
+            cache.popitem(last=False)
+
+    def best_move(self, board):
+        """按残局库选出最佳走法：赢棋时最快转换，输棋时尽量拖延"""
+        if not self.covers(board):
+            return None
+        parent_key = chess.polyglot.zobrist_hash(board)
+        with self.lock:
+            if parent_key in self.best_moves:
+                return self.best_moves[parent_key]
+        board = board.copy(stack=False)
+        best, best_key = None, None
+        for move in board.legal_moves:
+            board.push(move)
+            try:
+                result = self.probe(board)
+            finally:
+                board.pop()
+            if result is None:
+                return None  # 缺少某个子局面的表，放弃残局库走法
+            wdl, dtz = result  # 对手视角
+            key = (wdl, -dtz)
+            if best_key is None or key < best_key:
+                best, best_key = move, key
+        with self.lock:
+            self._remember(self.best_moves, parent_key, best)
+        return best
+
+    def result(self, board):
+        """残局库判定的对局结果（'1-0' / '0-1' / '1/2-1/2'），不在库中时返回 None"""
+        probed = self.probe(board)
+        if probed is None:
+            return None
+        wdl = probed[0]
+        if -1 <= wdl <= 1:
+            return "1/2-1/2"  # 和棋，以及受 50 步规则影响的胜负
+        winner = board.turn if wdl > 0 else not board.turn
+        return "1-0" if winner == chess.WHITE else "0-1"
+
+    def close(self):
+        if self.tablebase is not None:
+            self.tablebase.close()
+        self.tablebase = None
+        self.opened = False
+        self.cache.clear()
+        self.best_moves.clear()
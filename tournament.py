@@ -0,0 +1,239 @@
+"""
+无界面引擎对抗赛
+用进程池并行对局，比较不同引擎配置或开局书，结果输出为 PGN 流和胜负 / Elo 汇总
+
+示例:
+    python tournament.py --engine new=./engine/sf-new.exe --engine old=./engine/sf-old.exe \\
+        --option new:Hash=64 --games 1000 --time 0.1 --openings book --pgn result.pgn
+"""
+
+import os
+import sys
+import math
+import time
+import random
+import argparse
+import itertools
+import multiprocessing.util
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import chess
+import chess.engine
+import chess.pgn
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")  # constants 会导入 pygame，横幅不能混进标准输出的 PGN 流
+from constants import OPENINGS_DATA
+from engine_manager import EngineManager
+from logic import GameLogic
+
+# 工作进程内的全局状态（每个进程一份，由 _init_worker 创建）
+_logic = None
+_engines = None
+
+
+def _init_worker(engines):
+    global _logic, _engines
+    _engines = engines
+    _logic = GameLogic(EngineManager(idle_timeout=0))
+    multiprocessing.util.Finalize(None, _logic.engine_manager.shutdown, exitpriority=10)
+
+
+def _play_game(white, black, opening, limit, max_plies, game_index):
+    """在工作进程中下完一盘棋，返回 (PGN 文本, 结果)"""
+    logic = _logic
+    logic.reset()
+    for move in opening:
+        logic.board.push(move)
+    handles = {}
+    for name in (white, black):
+        if name not in handles:
+            path, options = _engines[name]
+            handles[name] = logic.engine_manager.acquire(path, options, role=name)
+    termination = "normal"
+    try:
+        while True:
+            board = logic.board
+            outcome = board.outcome(claim_draw=True)
+            if outcome:
+                result = outcome.result()
+                break
+            if (adjudicated := logic.adjudicate()) is not None:
+                result, termination = adjudicated, "adjudication"
+                break
+            if len(board.move_stack) >= max_plies:
+                result, termination = "1/2-1/2", "adjudication"
+                break
+            name = white if board.turn == chess.WHITE else black
+            play = handles[name].engine.play(board, limit, game=logic.game_key)
+            if play.move is None:
+                result = "0-1" if board.turn == chess.WHITE else "1-0"
+                break
+            board.push(play.move)
+    finally:
+        for handle in handles.values():
+            logic.engine_manager.release(handle)
+
+    game = chess.pgn.Game.from_board(logic.board)
+    game.headers["Event"] = "Bear-Chess tournament"
+    game.headers["Round"] = str(game_index + 1)
+    game.headers["White"] = white
+    game.headers["Black"] = black
+    game.headers["Result"] = result
+    game.headers["Termination"] = termination
+    return str(game), result
+
+
+def book_openings(count, plies, seed):
+    """从 polyglot 开局书按权重随机走出 count 条不同的开局"""
+    rng = random.Random(seed)
+    logic = GameLogic(EngineManager(idle_timeout=0))
+    openings, seen = [], set()
+    for _ in range(count * 20):
+        logic.reset()
+        for _ in range(plies):
+            entries = logic.get_book_entries()
+            if not entries:
+                break
+            logic.board.push(rng.choices(entries, weights=[e.weight for e in entries])[0].move)
+        line = tuple(logic.board.move_stack)
+        if line and line not in seen:
+            seen.add(line)
+            openings.append(list(line))
+            if len(openings) >= count:
+                break
+    return openings
+
+
+def json_openings():
+    """OPENINGS_DATA 中的所有开局线路"""
+    openings = []
+    for seq in OPENINGS_DATA.values():
+        board = chess.Board()
+        try:
+            openings.append([board.push_uci(uci) for uci in seq])
+        except ValueError:
+            print(f"忽略非法开局线路: {' '.join(seq)}", file=sys.stderr)
+    return openings
+
+
+def elo_stats(wins, draws, losses):
+    """返回 (Elo 差, 95% 置信区间半宽)，无法计算时为 inf"""
+    n = wins + draws + losses
+    if n == 0:
+        return 0.0, math.inf
+    score = (wins + draws / 2) / n
+    if score in (0.0, 1.0):
+        return (math.inf if score else -math.inf), math.inf
+    variance = (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score ** 2) / n
+    margin = 1.96 * math.sqrt(variance / n)
+
+    def to_elo(p):
+        if p <= 0:
+            return -math.inf
+        if p >= 1:
+            return math.inf
+        return -400 * math.log10(1 / p - 1)
+
+    return to_elo(score) + 0.0, (to_elo(min(1.0, score + margin)) - to_elo(max(0.0, score - margin))) / 2
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="无界面引擎对抗赛")
+    parser.add_argument("--engine", action="append", required=True, metavar="NAME=PATH",
+                        help="参赛引擎，可重复；至少两个")
+    parser.add_argument("--option", action="append", default=[], metavar="NAME:KEY=VALUE",
+                        help="引擎 UCI 选项，例如 new:Hash=64")
+    parser.add_argument("--games", type=int, default=100, help="每对引擎的对局数（双方轮流执白）")
+    parser.add_argument("--time", type=float, default=None, help="每步思考时间（秒）")
+    parser.add_argument("--depth", type=int, default=None, help="每步搜索深度")
+    parser.add_argument("--nodes", type=int, default=None, help="每步搜索节点数")
+    parser.add_argument("--openings", choices=["json", "book"], default="json",
+                        help="开局来源：openings.json 或 polyglot 开局书")
+    parser.add_argument("--book-plies", type=int, default=8, help="从开局书走出的半回合数")
+    parser.add_argument("--max-plies", type=int, default=400, help="超过该半回合数判和")
+    parser.add_argument("--workers", type=int, default=None, help="并行进程数，默认 CPU 核数")
+    parser.add_argument("--pgn", default="-", help="PGN 输出文件，- 表示标准输出")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+    names = set()
+    for spec in args.engine:
+        name, sep, path = spec.partition("=")
+        if not sep or not name or not path:
+            parser.error(f"--engine 格式应为 NAME=PATH: {spec}")
+        names.add(name)
+    for spec in args.option:
+        name, _, setting = spec.partition(":")
+        if name not in names:
+            parser.error(f"--option 指定了未定义的引擎: {name}")
+        if "=" not in setting:
+            parser.error(f"--option 格式应为 NAME:KEY=VALUE: {spec}")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    engines = {}
+    for spec in args.engine:
+        name, _, path = spec.partition("=")
+        engines[name] = (path, {"Threads": 1, "Hash": 16})  # 单线程：多进程并行时吞吐随核数线性增长
+    for spec in args.option:
+        name, _, setting = spec.partition(":")
+        key, _, value = setting.partition("=")
+        engines[name][1][key] = int(value) if value.lstrip("-").isdigit() else value
+    if len(engines) < 2:
+        sys.exit("至少需要两个引擎")
+    if args.time is None and args.depth is None and args.nodes is None:
+        args.time = 0.1
+    limit = chess.engine.Limit(time=args.time, depth=args.depth, nodes=args.nodes)
+
+    pairs = list(itertools.combinations(engines, 2))
+    rounds = (args.games + 1) // 2
+    if args.openings == "book":
+        openings = book_openings(rounds, args.book_plies, args.seed)
+    else:
+        openings = json_openings()
+    if not openings:
+        openings = [[]]
+
+    # 每条开局下两盘，双方交换先后手
+    schedule = []
+    for a, b in pairs:
+        for i in range(args.games):
+            opening = openings[(i // 2) % len(openings)]
+            schedule.append((a, b, opening) if i % 2 == 0 else (b, a, opening))
+
+    out = sys.stdout if args.pgn == "-" else open(args.pgn, "w", encoding="utf-8")
+    stats = {pair: [0, 0, 0] for pair in pairs}  # 以 pair[0] 为视角的 胜/和/负
+    start = time.perf_counter()
+    try:
+        with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker, initargs=(engines,)) as pool:
+            futures = {pool.submit(_play_game, white, black, opening, limit, args.max_plies, i): (white, black)
+                       for i, (white, black, opening) in enumerate(schedule)}
+            for done, future in enumerate(as_completed(futures), 1):
+                white, black = futures[future]
+                try:
+                    pgn, result = future.result()
+                except Exception as e:
+                    print(f"\n对局失败 ({white} vs {black}): {e}", file=sys.stderr)
+                    continue
+                out.write(pgn + "\n\n")
+                out.flush()
+                pair = (white, black) if (white, black) in stats else (black, white)
+                if result == "1/2-1/2":
+                    stats[pair][1] += 1
+                elif (result == "1-0") == (pair[0] == white):
+                    stats[pair][0] += 1
+                else:
+                    stats[pair][2] += 1
+                elapsed = time.perf_counter() - start
+                print(f"\r{done}/{len(schedule)} 局  {done / elapsed * 60:.1f} 局/分钟", end="", file=sys.stderr)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    print(file=sys.stderr)
+    for (a, b), (wins, draws, losses) in stats.items():
+        elo, margin = elo_stats(wins, draws, losses)
+        print(f"{a} vs {b}: +{wins} ={draws} -{losses}  Elo {elo:+.1f} ± {margin:.1f}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()